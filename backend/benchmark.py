@@ -0,0 +1,252 @@
+"""Offline benchmarks for the backend's hot paths
+
+Run from the backend directory, e.g.:
+    python benchmark.py ann --items 200000 --queries 200
+    python benchmark.py json --items 100
+    python benchmark.py decode --images 20
+    python benchmark.py descriptors --candidates 100
+"""
+import argparse
+import base64
+import json
+import multiprocessing
+import time
+import uuid
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import cv2
+import numpy as np
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from PIL import Image
+
+from descriptor_match import match_scores
+from feature_index import FeatureIndex, IVFFeatureIndex
+from image_engine import ImageSimilarityEngine
+from json_response import dumps
+
+
+def synthetic_features(count: int, dim: int = 32, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Clustered non-negative vectors shaped like averaged ORB descriptors"""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0, 255, size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=count)
+    return np.clip(centers[labels] + rng.normal(0, 20, size=(count, dim)), 0, 255).astype(np.float32)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def benchmark_ann(items: int, queries: int, nprobes, k: int = 15, threshold: float = 0.2):
+    """Compare IVF recall@k and latency against the exact feature index scan"""
+    vectors = synthetic_features(items)
+    rng = np.random.default_rng(1)
+    query_vectors = vectors[rng.integers(0, items, size=queries)] + rng.normal(0, 10, size=(queries, vectors.shape[1]))
+
+    exact = FeatureIndex(vectors.shape[1], initial_capacity=items)
+    ivf = IVFFeatureIndex(vectors.shape[1])
+    _, exact_build = timed(lambda: [exact.add(str(i), vector) for i, vector in enumerate(vectors)])
+    _, ivf_build = timed(lambda: [ivf.add(str(i), vector) for i, vector in enumerate(vectors)])
+    print(f"items={items} queries={queries} k={k}")
+    print(f"build: exact {exact_build:.2f}s, ivf {ivf_build:.2f}s ({len(ivf._lists)} lists)")
+
+    truth = []
+    start = time.perf_counter()
+    for query in query_vectors:
+        truth.append({item_id for item_id, _ in exact.search(query, k, threshold)})
+    exact_ms = (time.perf_counter() - start) / queries * 1000
+    print(f"exact:        {exact_ms:8.3f} ms/query  recall@{k} 1.000")
+
+    for nprobe in nprobes:
+        hits = 0
+        start = time.perf_counter()
+        results = [ivf.search(query, k, threshold, nprobe=nprobe) for query in query_vectors]
+        ivf_ms = (time.perf_counter() - start) / queries * 1000
+        for expected, result in zip(truth, results):
+            hits += len(expected & {item_id for item_id, _ in result})
+        recall = hits / max(1, sum(len(expected) for expected in truth))
+        print(f"ivf nprobe={nprobe:<3} {ivf_ms:8.3f} ms/query  recall@{k} {recall:.3f}")
+
+
+def synthetic_items(count: int):
+    """Listing documents shaped like raw Motor results, ObjectIds and datetimes included"""
+    now = datetime.utcnow()
+    return [{
+        "_id": ObjectId(),
+        "id": str(uuid.uuid4()),
+        "type": "found",
+        "title": f"Black backpack {i}",
+        "category": "Bags",
+        "description": "Black backpack with a laptop sleeve, found near the main entrance " * 2,
+        "location": "Library",
+        "specificLocation": "Second floor reading room",
+        "date": "2024-01-15",
+        "thumbnail": f"/api/images/{uuid.uuid4().hex * 2}?size=256",
+        "status": "active",
+        "finderInfo": {"name": "Campus Security", "email": "security@umt.edu", "phone": "555-0100"},
+        "createdAt": now - timedelta(minutes=i),
+        "updatedAt": now - timedelta(minutes=i),
+    } for i in range(count)]
+
+
+def legacy_encode(content) -> bytes:
+    """The previous response path: ObjectId walk, then jsonable_encoder, then json.dumps"""
+    def convert_objectid_to_str(obj):
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        elif isinstance(obj, dict):
+            return {key: convert_objectid_to_str(value) for key, value in obj.items()}
+        elif isinstance(obj, list):
+            return [convert_objectid_to_str(item) for item in obj]
+        return obj
+
+    content = {**content, "items": convert_objectid_to_str(content["items"])}
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def benchmark_json(items: int, repeats: int):
+    """Compare encoding one listing page with the legacy path and with orjson"""
+    page = {"success": True, "count": items, "items": synthetic_items(items), "next_cursor": None}
+    assert json.loads(legacy_encode(page)) == json.loads(dumps(page))
+    print(f"items={items} repeats={repeats} body={len(dumps(page))} bytes")
+
+    for name, encode in (("legacy", legacy_encode), ("orjson", dumps)):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            encode(page)
+        elapsed_ms = (time.perf_counter() - start) / repeats * 1000
+        print(f"{name}: {elapsed_ms:8.3f} ms/page")
+
+
+def synthetic_photo(width: int = 4000, height: int = 3000, seed: int = 0) -> str:
+    """Base64 JPEG data URL with the dimensions of a 12 MP phone photo"""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)
+    image = np.repeat(np.repeat(gradient[None, :, None], height, axis=0), 3, axis=2).astype(np.uint8)
+    for _ in range(60):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        w, h = int(rng.integers(100, 800)), int(rng.integers(100, 800))
+        cv2.rectangle(image, (x, y), (x + w, y + h), tuple(int(c) for c in rng.integers(0, 256, 3)), -1)
+    image = cv2.add(image, rng.integers(0, 12, image.shape, dtype=np.uint8))
+    encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1]
+    return "data:image/jpeg;base64," + base64.b64encode(encoded.tobytes()).decode()
+
+
+def legacy_features(engine: ImageSimilarityEngine, image: str):
+    """The previous ingestion path: full-resolution RGB decode, BGR copy, then grayscale and resize"""
+    pil_image = Image.open(BytesIO(base64.b64decode(image.split(",", 1)[-1]))).convert("RGB")
+    return engine.extract_features(cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR))
+
+
+def draft_features(engine: ImageSimilarityEngine, image: str):
+    """The ingestion and query path: decode_image_data, then a draft-mode RGB decode shared by the signature"""
+    features = engine.compute_signature(image).features
+    return None if features is None else np.array(features)
+
+
+def memory_status(field: str) -> float:
+    """A field of /proc/self/status in MiB (Linux only)"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def measure_decode(path: str, images):
+    """Child process: per-image latency and peak RSS growth while ingesting images"""
+    engine = ImageSimilarityEngine()
+    extract = legacy_features if path == "legacy" else draft_features
+    # Reset the peak RSS, which a spawned child inherits from its parent, then measure from here
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    baseline = memory_status("VmRSS")
+    start = time.perf_counter()
+    features = [extract(engine, image) for image in images]
+    elapsed_ms = (time.perf_counter() - start) / len(images) * 1000
+    return elapsed_ms, memory_status("VmHWM") - baseline, features
+
+
+def benchmark_decode(images: int, width: int, height: int):
+    """Compare feature extraction from full-resolution decodes with the draft-mode RGB signature path"""
+    photos = [synthetic_photo(width, height, seed) for seed in range(images)]
+    print(f"images={images} size={width}x{height} base64={len(photos[0]) / 2 ** 20:.1f} MiB each")
+
+    # Each path runs in a fresh process so one path's allocations cannot hide the other's
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for path in ("legacy", "draft"):
+        with context.Pool(1) as pool:
+            elapsed_ms, peak_mib, features = pool.apply(measure_decode, (path, photos))
+        results[path] = features
+        print(f"{path:<6}: {elapsed_ms:8.2f} ms/image  peak RSS +{peak_mib:6.1f} MiB")
+
+    # Stored vectors come from the legacy path, so new ones must stay comparable
+    similarities = [
+        float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+        for a, b in zip(results["legacy"], results["draft"]) if a is not None and b is not None
+    ]
+    if similarities:
+        print(f"feature cosine similarity legacy vs draft: mean {np.mean(similarities):.4f}, min {np.min(similarities):.4f}")
+
+
+def benchmark_descriptors(candidates: int, descriptors: int, repeats: int):
+    """Time re-ranking a coarse candidate list by ratio-tested ORB descriptor matching"""
+    rng = np.random.default_rng(0)
+    query = rng.integers(0, 256, size=(descriptors, 32), dtype=np.uint8)
+    items = [rng.integers(0, 256, size=(descriptors, 32), dtype=np.uint8) for _ in range(candidates)]
+    # One candidate shares most of the query's descriptors with a few bits flipped
+    noise = rng.random(query.shape) < 0.02
+    items[candidates // 2] = query ^ (noise * rng.integers(1, 256, size=query.shape)).astype(np.uint8)
+    print(f"candidates={candidates} descriptors={descriptors} per image")
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        scores = match_scores(query, items)
+    elapsed_ms = (time.perf_counter() - start) / repeats * 1000
+    print(f"re-rank: {elapsed_ms:8.2f} ms/query ({elapsed_ms / candidates:.3f} ms/candidate)")
+    print(f"planted match score {scores[candidates // 2]:.3f}, best other {np.delete(scores, candidates // 2).max():.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UMT Belongings Hub backend benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    ann = subparsers.add_parser("ann", help="IVF feature index vs exact scan")
+    ann.add_argument("--items", type=int, default=100000)
+    ann.add_argument("--queries", type=int, default=200)
+    ann.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+
+    page = subparsers.add_parser("json", help="listing page encoding, legacy path vs orjson")
+    page.add_argument("--items", type=int, default=100)
+    page.add_argument("--repeats", type=int, default=200)
+
+    decode = subparsers.add_parser("decode", help="image ingestion, full-resolution decode vs draft-mode RGB signature")
+    decode.add_argument("--images", type=int, default=20)
+    decode.add_argument("--width", type=int, default=4000)
+    decode.add_argument("--height", type=int, default=3000)
+
+    rerank = subparsers.add_parser("descriptors", help="ORB descriptor re-ranking of coarse candidates")
+    rerank.add_argument("--candidates", type=int, default=100)
+    rerank.add_argument("--descriptors", type=int, default=500)
+    rerank.add_argument("--repeats", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.benchmark == "ann":
+        benchmark_ann(args.items, args.queries, args.nprobe)
+    elif args.benchmark == "json":
+        benchmark_json(args.items, args.repeats)
+    elif args.benchmark == "decode":
+        benchmark_decode(args.images, args.width, args.height)
+    elif args.benchmark == "descriptors":
+        benchmark_descriptors(args.candidates, args.descriptors, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import os
+import re
+from typing import AsyncIterator, Optional
+
+from gridfs.errors import FileExists, NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo.errors import DuplicateKeyError
+
+# Content hashes, optionally suffixed with a rendition size, e.g. "<sha256>_256"
+BLOB_ID_PATTERN = re.compile(r"^[0-9a-f]{64}(_[0-9]+)?$")
+CHUNK_SIZE = 256 * 1024
+
+
+def sniff_content_type(data: bytes) -> str:
+    """Detect the image type from its leading bytes"""
+    if data.startswith(b'\xff\xd8\xff'):
+        return "image/jpeg"
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return "image/png"
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return "image/gif"
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def blob_id_for(data: bytes) -> str:
+    """Content address of a blob: identical images share one stored copy"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def rendition_id(blob_id: str, size: int) -> str:
+    """Id of a resized rendition derived from an original blob"""
+    return f"{blob_id}_{size}"
+
+
+class Blob:
+    """A stored blob opened for streaming"""
+
+    def __init__(self, blob_id: str, length: int, content_type: str, chunks: AsyncIterator[bytes]):
+        self.blob_id = blob_id
+        self.length = length
+        self.content_type = content_type
+        self.chunks = chunks
+
+
+class LocalBlobStore:
+    """Content-addressed blob store in a local directory, fanned out by id prefix"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, blob_id: str) -> str:
+        return os.path.join(self.root, blob_id[:2], blob_id[2:4], blob_id)
+
+    def _write(self, blob_id: str, data: bytes):
+        path = self._path(blob_id)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    async def put(self, data: bytes, blob_id: Optional[str] = None) -> str:
+        blob_id = blob_id or blob_id_for(data)
+        await asyncio.to_thread(self._write, blob_id, data)
+        return blob_id
+
+    def _read(self, blob_id: str) -> bytes:
+        with open(self._path(blob_id), "rb") as f:
+            return f.read()
+
+    def _stat(self, blob_id: str):
+        path = self._path(blob_id)
+        with open(path, "rb") as f:
+            head = f.read(16)
+        return path, os.path.getsize(path), head
+
+    async def open(self, blob_id: str) -> Optional[Blob]:
+        if not BLOB_ID_PATTERN.match(blob_id):
+            return None
+        try:
+            path, length, head = await asyncio.to_thread(self._stat, blob_id)
+        except FileNotFoundError:
+            return None
+
+        async def chunks():
+            with open(path, "rb") as f:
+                while True:
+                    chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        return Blob(blob_id, length, sniff_content_type(head), chunks())
+
+    async def get(self, blob_id: str) -> Optional[bytes]:
+        if not BLOB_ID_PATTERN.match(blob_id):
+            return None
+        try:
+            return await asyncio.to_thread(self._read, blob_id)
+        except FileNotFoundError:
+            return None
+
+
+class GridFSBlobStore:
+    """Content-addressed blob store in a MongoDB GridFS bucket"""
+
+    def __init__(self, db, bucket_name: str = "images"):
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+        self.files = db[f"{bucket_name}.files"]
+
+    async def put(self, data: bytes, blob_id: Optional[str] = None) -> str:
+        blob_id = blob_id or blob_id_for(data)
+        if await self.files.find_one({"_id": blob_id}, {"_id": 1}) is None:
+            try:
+                await self.bucket.upload_from_stream_with_id(
+                    blob_id, blob_id, data,
+                    metadata={"contentType": sniff_content_type(data)}
+                )
+            except (FileExists, DuplicateKeyError):
+                # A concurrent upload of the same content got there first; the same id means the same bytes
+                pass
+        return blob_id
+
+    async def open(self, blob_id: str) -> Optional[Blob]:
+        if not BLOB_ID_PATTERN.match(blob_id):
+            return None
+        try:
+            grid_out = await self.bucket.open_download_stream(blob_id)
+        except NoFile:
+            return None
+
+        async def chunks():
+            while True:
+                chunk = await grid_out.readchunk()
+                if not chunk:
+                    break
+                yield chunk
+
+        content_type = (grid_out.metadata or {}).get("contentType", "application/octet-stream")
+        return Blob(blob_id, grid_out.length, content_type, chunks())
+
+    async def get(self, blob_id: str) -> Optional[bytes]:
+        blob = await self.open(blob_id)
+        if blob is None:
+            return None
+        return b"".join([chunk async for chunk in blob.chunks])
+
+
+def create_blob_store(kind: str, db=None, root: Optional[str] = None):
+    """Build the configured blob store ('gridfs' or 'local')"""
+    if kind == "local":
+        return LocalBlobStore(root)
+    if kind == "gridfs":
+        return GridFSBlobStore(db)
+    raise ValueError(f"Unknown image store: {kind}")
@@ -0,0 +1,117 @@
+"""Import lost or found items from an NDJSON or CSV file through the bulk report API
+
+Rows are streamed from the file and posted in chunks, so large exports never have
+to fit in memory. CSV columns are item fields; nested contact details use dotted
+columns (finderInfo.name, finderInfo.email, ...). An image column may hold a base64
+data URL or a path to an image file. For example:
+
+    python bulk_import.py found security_export.csv --url http://localhost:8001
+"""
+import argparse
+import base64
+import csv
+import json
+import mimetypes
+import os
+import sys
+import urllib.error
+import urllib.request
+from itertools import islice
+from typing import Any, Dict, Iterator, List
+
+
+def read_ndjson(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_csv(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            item: Dict[str, Any] = {}
+            for column, value in row.items():
+                # Empty cells are left out so the API applies its defaults
+                if column is None or value is None or not value.strip():
+                    continue
+                target = item
+                *parents, field = column.strip().split(".")
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                target[field] = value.strip()
+            yield item
+
+
+def inline_image(item: Dict[str, Any], base_dir: str) -> Dict[str, Any]:
+    """Replace an image file path with a base64 data URL"""
+    image = item.get("image")
+    if not image or image.startswith("data:"):
+        return item
+    path = image if os.path.isabs(image) else os.path.join(base_dir, image)
+    if not os.path.isfile(path):
+        return item
+    content_type = mimetypes.guess_type(path)[0] or "image/jpeg"
+    with open(path, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode()
+    return {**item, "image": f"data:{content_type};base64,{encoded}"}
+
+
+def chunks(items: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def post_chunk(url: str, item_type: str, chunk: List[Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/api/items/{item_type}/bulk",
+        data=json.dumps(chunk).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk import lost or found items from NDJSON or CSV")
+    parser.add_argument("item_type", choices=["lost", "found"])
+    parser.add_argument("path", help="NDJSON (.ndjson/.jsonl) or CSV file")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="defaults to the file extension")
+    parser.add_argument("--url", default=os.environ.get("BACKEND_URL", "http://localhost:8001"))
+    parser.add_argument("--chunk-size", type=int, default=100, help="items per request, at most the server's BULK_MAX_ITEMS")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    file_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    rows = read_csv(args.path) if file_format == "csv" else read_ndjson(args.path)
+    base_dir = os.path.dirname(os.path.abspath(args.path))
+    items = (inline_image(item, base_dir) for item in rows)
+
+    inserted = failed = 0
+    offset = 0
+    for chunk in chunks(items, args.chunk_size):
+        try:
+            response = post_chunk(args.url, args.item_type, chunk, args.timeout)
+        except urllib.error.HTTPError as e:
+            print(f"Rows {offset + 1}-{offset + len(chunk)} rejected: {e.code} {e.read().decode(errors='replace')}", file=sys.stderr)
+            failed += len(chunk)
+            offset += len(chunk)
+            continue
+
+        inserted += response["inserted"]
+        failed += response["failed"]
+        for result in response["results"]:
+            if not result["success"]:
+                print(f"Row {offset + result['index'] + 1}: {result['error']}", file=sys.stderr)
+        offset += len(chunk)
+        print(f"{offset} rows sent, {inserted} inserted, {failed} failed")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Declarative MongoDB index registry for the item collections
+
+Indexes are created idempotently at server startup. Run this module directly to
+create them and verify that every endpoint's canonical query is served by an index:
+
+    python db_indexes.py --check
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Set
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+# Weighted full-text index backing the default search mode
+TEXT_INDEX_WEIGHTS = {"title": 10, "location": 5, "specificLocation": 5, "description": 2}
+
+# Every listing filters on status and pages newest first on (createdAt, _id)
+NEWEST_FIRST = [("createdAt", DESCENDING), ("_id", DESCENDING)]
+
+ITEM_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id"),
+    IndexModel([("imageId", ASCENDING)], name="imageId"),
+    IndexModel([("status", ASCENDING)] + NEWEST_FIRST, name="status_createdAt_id"),
+    IndexModel([("status", ASCENDING), ("category", ASCENDING)] + NEWEST_FIRST, name="status_category_createdAt_id"),
+    IndexModel([("status", ASCENDING), ("type", ASCENDING)] + NEWEST_FIRST, name="status_type_createdAt_id"),
+    IndexModel([("status", ASCENDING), ("date", ASCENDING)] + NEWEST_FIRST, name="status_date_createdAt_id"),
+    # Multikey over the lower-cased words of location and specificLocation
+    IndexModel([("status", ASCENDING), ("locationTerms", ASCENDING)] + NEWEST_FIRST, name="status_locationTerms_createdAt_id"),
+    IndexModel([(field, TEXT) for field in TEXT_INDEX_WEIGHTS], name="item_text", weights=TEXT_INDEX_WEIGHTS),
+]
+
+# Indexes superseded by the registry, dropped by ensure_indexes when present
+RETIRED_INDEXES = [
+    "status_createdAt",
+    "status_category_createdAt",
+    "status_type_createdAt",
+    "status_date_createdAt",
+    "status_location_createdAt_id",
+]
+
+# Lost/found pairs, read from either side ordered by score
+MATCH_INDEXES = [
+    IndexModel([("lostId", ASCENDING), ("foundId", ASCENDING)], name="lostId_foundId", unique=True),
+    IndexModel([("lostId", ASCENDING), ("score", DESCENDING)], name="lostId_score"),
+    IndexModel([("foundId", ASCENDING), ("score", DESCENDING)], name="foundId_score"),
+]
+
+# Background job records; finished jobs expire after JOB_RETENTION_DAYS
+JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', '7'))
+JOB_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id", unique=True),
+    IndexModel([("status", ASCENDING), ("runAt", ASCENDING)], name="status_runAt"),
+    IndexModel([("finishedAt", ASCENDING)], name="finishedAt_ttl", expireAfterSeconds=JOB_RETENTION_DAYS * 86400),
+]
+
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    "lost_items": ITEM_INDEXES,
+    "found_items": ITEM_INDEXES,
+    "matches": MATCH_INDEXES,
+    "jobs": JOB_INDEXES,
+}
+
+# Canonical query shape of each endpoint: (name, filter, sort, whether an in-memory sort is acceptable)
+ITEM_QUERIES = [
+    ("get_items", {"status": "active"}, NEWEST_FIRST, False),
+    ("get_items next page", {"status": "active", "$or": [
+        {"createdAt": {"$lt": datetime(2024, 1, 1)}},
+        {"createdAt": datetime(2024, 1, 1), "_id": {"$lt": ObjectId("65920080" + "0" * 16)}}
+    ]}, NEWEST_FIRST, False),
+    ("search_items category", {"status": "active", "category": "Electronics"}, NEWEST_FIRST, False),
+    ("search_items regex", {"status": "active", "$or": [{"title": {"$regex": "phone", "$options": "i"}}]}, NEWEST_FIRST, False),
+    # Relevance ordering is always computed in memory over the text index matches
+    ("search_items text", {"status": "active", "$text": {"$search": "phone"}}, None, True),
+    ("quick_search type", {"status": "active", "type": "lost"}, NEWEST_FIRST, False),
+    ("quick_search date", {"status": "active", "date": "2024-01-01"}, NEWEST_FIRST, False),
+    ("quick_search location", {"status": "active", "locationTerms": {"$all": ["main", "library"]}}, NEWEST_FIRST, False),
+    ("search index refresh", {"status": "active", "createdAt": {"$gte": datetime(2024, 1, 1)}}, None, False),
+    ("visual_search fetch", {"id": {"$in": ["a", "b"]}, "status": "active"}, None, False),
+    ("visual_search scan", {"status": "active", "imageFeatures": {"$ne": None}}, None, False),
+    ("visual_search cascade category", {"status": "active", "category": "Electronics"}, None, False),
+    ("visual_search cascade dates", {"status": "active", "date": {"$gte": "2024-01-01", "$lte": "2024-01-31"}}, None, False),
+    ("get_item_matches lookup", {"id": "a"}, None, False),
+    ("visual_search stored signature", {"imageId": "a", "imageHistogram": {"$ne": None}}, None, False),
+]
+
+MATCH_QUERIES = [
+    ("get_item_matches lost", {"lostId": "a"}, [("score", DESCENDING)], False),
+    ("get_item_matches found", {"foundId": "a"}, [("score", DESCENDING)], False),
+    ("match_item upsert", {"lostId": "a", "foundId": "b"}, None, False),
+]
+
+JOB_QUERIES = [
+    ("get_job", {"id": "a"}, None, False),
+    ("job queue recovery", {"status": "queued"}, [("runAt", ASCENDING)], False),
+    ("stale job sweep", {"status": "queued", "runAt": {"$lt": datetime(2024, 1, 1)}}, [("runAt", ASCENDING)], False),
+    ("job lease recovery", {"status": "running", "$or": [
+        {"leaseExpiresAt": {"$lt": datetime(2024, 1, 1)}}, {"leaseExpiresAt": None}
+    ]}, None, False),
+]
+
+CANONICAL_QUERIES = {
+    "lost_items": ITEM_QUERIES,
+    "found_items": ITEM_QUERIES,
+    "matches": MATCH_QUERIES,
+    "jobs": JOB_QUERIES,
+}
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every registered index and drop retired ones; existing indexes with the same spec are left untouched"""
+    created = {}
+    for collection_name, indexes in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        for name in RETIRED_INDEXES:
+            if name in existing:
+                await collection.drop_index(name)
+        created[collection_name] = await collection.create_indexes(indexes)
+    return created
+
+
+def plan_stages(plan: Any) -> Set[str]:
+    """Every stage name anywhere in an explain() plan tree"""
+    stages = set()
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            stages |= plan_stages(value)
+    return stages
+
+
+async def check_query_plans(db) -> List[str]:
+    """Explain each canonical query and describe any that scan the collection or sort in memory"""
+    problems = []
+    for collection_name, queries in CANONICAL_QUERIES.items():
+        for name, query, sort, allow_sort in queries:
+            cursor = db[collection_name].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            explain = await cursor.limit(50).explain()
+            stages = plan_stages(explain.get("queryPlanner", {}).get("winningPlan"))
+
+            if "COLLSCAN" in stages:
+                problems.append(f"{collection_name}: {name} uses a COLLSCAN")
+            if not allow_sort and "SORT" in stages:
+                problems.append(f"{collection_name}: {name} sorts in memory")
+    return problems
+
+
+async def main(mongo_url: str, check: bool) -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    db = AsyncIOMotorClient(mongo_url).umt_belongings_hub
+    for collection_name, names in (await ensure_indexes(db)).items():
+        print(f"{collection_name}: {', '.join(names)}")
+
+    if not check:
+        return 0
+
+    problems = await check_query_plans(db)
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        return 1
+    print("All canonical queries are index-backed")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the item indexes and optionally verify query plans")
+    parser.add_argument("--check", action="store_true", help="fail if any canonical query plan has a COLLSCAN or in-memory SORT")
+    parser.add_argument("--mongo-url", default=os.environ.get('MONGO_URL', 'mongodb://localhost:27017/umt_belongings_hub'))
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.mongo_url, args.check)))
@@ -0,0 +1,74 @@
+from typing import Optional, Sequence
+
+import numpy as np
+
+# ORB descriptors are 256-bit binary strings
+DESCRIPTOR_BYTES = 32
+
+
+def pack_descriptors(descriptors: Optional[np.ndarray]) -> Optional[bytes]:
+    """Store an (n, 32) uint8 ORB descriptor array as raw bytes, n * 32 long"""
+    if descriptors is None or len(descriptors) == 0:
+        return None
+    return np.ascontiguousarray(descriptors, dtype=np.uint8).tobytes()
+
+
+def unpack_descriptors(data: Optional[bytes]) -> np.ndarray:
+    """View stored descriptor bytes as an (n, 32) uint8 array without copying"""
+    if not data:
+        return np.empty((0, DESCRIPTOR_BYTES), dtype=np.uint8)
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, DESCRIPTOR_BYTES)
+
+
+def descriptor_bits(descriptors: np.ndarray) -> np.ndarray:
+    """Expand descriptors to one float32 0/1 column per bit, ready for a matrix product"""
+    return np.unpackbits(descriptors, axis=-1).astype(np.float32)
+
+
+def match_scores(query: np.ndarray, candidates: Sequence[np.ndarray], ratio: float = 0.8,
+                 max_distance: int = 64, batch_size: int = 16) -> np.ndarray:
+    """Score candidate images against a query image by ratio-tested Hamming matches of their ORB descriptors
+
+    For binary vectors the Hamming distance is popcount(a) + popcount(b) - 2 * (a . b), so
+    the distances from every query descriptor to every descriptor of a batch of candidates
+    come from a single BLAS matrix product over the unpacked bits. A query descriptor counts
+    as matched when its nearest neighbour in a candidate is within max_distance bits and
+    clearly nearer than the second nearest (Lowe's ratio test). Each score is the matched
+    fraction of the smaller descriptor set, in [0, 1].
+    """
+    scores = np.zeros(len(candidates), dtype=np.float32)
+    if len(query) == 0:
+        return scores
+    query_bits = descriptor_bits(query)
+    query_counts = query_bits.sum(axis=1)
+
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start:start + batch_size]
+        sizes = np.array([len(descriptors) for descriptors in batch])
+        width = int(sizes.max())
+        if width == 0:
+            continue
+
+        # Pad every candidate to the widest one; padded slots get an infinite bit count so they never match
+        padded = np.zeros((len(batch), width, DESCRIPTOR_BYTES), dtype=np.uint8)
+        for row, descriptors in enumerate(batch):
+            padded[row, :len(descriptors)] = descriptors
+        bits = descriptor_bits(padded).reshape(-1, DESCRIPTOR_BYTES * 8)
+        counts = bits.sum(axis=1)
+        counts[(np.arange(width)[None, :] >= sizes[:, None]).ravel()] = np.inf
+
+        # Built in place: the distance matrix is the largest array here
+        distances = query_bits @ bits.T
+        distances *= -2
+        distances += counts
+        distances += query_counts[:, None]
+        distances = distances.reshape(len(query), len(batch), width)
+
+        # Nearest and second nearest per (query descriptor, candidate), without a full partition
+        nearest = distances.argmin(axis=2)[:, :, None]
+        best = np.take_along_axis(distances, nearest, axis=2)[:, :, 0]
+        np.put_along_axis(distances, nearest, np.inf, axis=2)
+        second = distances.min(axis=2)
+        matched = (best <= max_distance) & (best < ratio * second)
+        scores[start:start + len(batch)] = matched.sum(axis=0) / np.maximum(np.minimum(sizes, len(query)), 1)
+    return scores
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+from image_engine import ImageSignature
+
+# Rough per-entry cost of the key, tuple and array headers on top of the payload
+ENTRY_OVERHEAD = 512
+
+
+def compact_signature(signature: ImageSignature) -> ImageSignature:
+    """Hold vectors as float32 arrays rather than lists of Python floats, which cost four times the memory"""
+    return ImageSignature(
+        np.asarray(signature.features, dtype=np.float32) if signature.features is not None else None,
+        signature.descriptors,
+        np.asarray(signature.histogram, dtype=np.float32) if signature.histogram is not None else None
+    )
+
+
+def signature_size(signature: ImageSignature) -> int:
+    size = ENTRY_OVERHEAD + len(signature.descriptors or b"")
+    for vector in (signature.features, signature.histogram):
+        if vector is not None:
+            size += vector.nbytes
+    return size
+
+
+class FeatureCache:
+    """LRU cache of query image signatures keyed by the content hash of the image bytes, within a byte budget
+
+    Extraction is deterministic for a given image, so entries never go stale; they are
+    only evicted, least recently used first, to stay within max_bytes. reused counts
+    misses that were served from a stored item's signature instead of being extracted.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, ImageSignature]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.reused = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, key: str):
+        self.size -= signature_size(self._entries.pop(key))
+
+    def get(self, key: str) -> Optional[ImageSignature]:
+        signature = self._entries.get(key)
+        if signature is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return signature
+
+    def put(self, key: str, signature: ImageSignature) -> ImageSignature:
+        """Store a signature, evicting least recently used entries; returns the compacted copy"""
+        signature = compact_signature(signature)
+        size = signature_size(signature)
+        if not self.enabled or size > self.max_bytes:
+            return signature
+
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = signature
+        self.size += size
+        while self.size > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+        return signature
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self), "bytes": self.size, "hits": self.hits, "misses": self.misses, "reused": self.reused}
@@ -0,0 +1,708 @@
+import asyncio
+import fcntl
+import os
+import re
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Slots of a shared index's meta file
+META_SEQUENCE, META_DIM, META_EPOCH, META_COUNT, META_LIVE, META_BUILT_AT = range(6)
+META_SLOTS = 8
+# Fixed-width item id slots; uuid4 ids are 36 bytes
+SHARED_ID_BYTES = 40
+
+
+def top_k(scores: np.ndarray, k: int, threshold: float) -> np.ndarray:
+    """Positions of the best k scores at or above threshold, best first"""
+    # The threshold is applied as a mask; only the k survivors are fully sorted
+    candidates = np.flatnonzero(scores >= threshold)
+    if candidates.size > k:
+        top = np.argpartition(-scores[candidates], k - 1)[:k]
+        candidates = candidates[top]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class FeatureIndex:
+    """Resident matrix of L2-normalised image feature vectors for one item type"""
+
+    def __init__(self, dim: int = 32, initial_capacity: int = 1024):
+        self.dim = dim
+        # Rows [0, size) are live; the matrix grows by doubling so inserts stay amortised O(1)
+        self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+    @classmethod
+    def from_vectors(cls, ids: List[str], vectors: np.ndarray, min_capacity: int = 64) -> "FeatureIndex":
+        """Build an index from distinct ids and their row-aligned, already normalised vectors in one copy"""
+        index = cls(vectors.shape[1], initial_capacity=max(len(ids), min_capacity))
+        index._matrix[:len(ids)] = vectors
+        index._ids = list(ids)
+        index._rows = {item_id: row for row, item_id in enumerate(index._ids)}
+        return index
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._rows
+
+    @staticmethod
+    def normalize(vector: Sequence[float]) -> Optional[np.ndarray]:
+        """Return a unit-length float32 copy of a vector, or None for a zero vector"""
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    def _grow(self):
+        capacity = self._matrix.shape[0] * 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:len(self)] = self._matrix[:len(self)]
+        self._matrix = matrix
+
+    def add(self, item_id: str, vector: Sequence[float]) -> bool:
+        """Insert or replace the vector stored for an item"""
+        vector = self.normalize(vector)
+        if vector is None or vector.shape[0] != self.dim:
+            return False
+
+        row = self._rows.get(item_id)
+        if row is None:
+            if len(self) == self._matrix.shape[0]:
+                self._grow()
+            row = len(self)
+            self._ids.append(item_id)
+            self._rows[item_id] = row
+
+        self._matrix[row] = vector
+        return True
+
+    def remove(self, item_id: str) -> bool:
+        """Drop an item by moving the last row into its slot"""
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return False
+
+        last = len(self) - 1
+        last_id = self._ids.pop()
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = last_id
+            self._rows[last_id] = row
+        return True
+
+    def clear(self):
+        self._ids = []
+        self._rows = {}
+
+    @contextmanager
+    def rebuilding(self):
+        """Clear the index for a full reload; items are added to the yielded index"""
+        self.clear()
+        yield self
+
+    def vectors(self) -> Tuple[List[str], np.ndarray]:
+        """Return the item ids and a view of their normalised vectors, row-aligned"""
+        return list(self._ids), self._matrix[:len(self)]
+
+    def search(self, query: Sequence[float], k: int = 15, threshold: float = 0.2,
+               ids: Optional[Collection[str]] = None, **options) -> List[Tuple[str, float]]:
+        """Return up to k (item_id, cosine similarity) pairs at or above threshold, best first
+
+        ids restricts the search to those items (ids not in this index are ignored).
+        """
+        query = self.normalize(query)
+        if query is None or len(self) == 0:
+            return []
+
+        # One matrix-vector product scores every item
+        if ids is None:
+            rows = np.arange(len(self))
+            scores = self._matrix[:len(self)] @ query
+        else:
+            rows = np.fromiter((self._rows[item_id] for item_id in ids if item_id in self._rows), dtype=np.int64)
+            scores = self._matrix[rows] @ query
+        return [(self._ids[rows[candidate]], float(scores[candidate])) for candidate in top_k(scores, k, threshold)]
+
+
+class IVFFeatureIndex:
+    """Approximate index that partitions vectors into inverted lists around k-means centroids
+
+    Below min_train_size every vector lives in one list and searches are exact. Once
+    trained, a query only scans the nprobe lists whose centroids are closest to it, so
+    nprobe trades recall for latency. The partitioning is retrained whenever the index
+    has doubled in size since the last training; inside an event loop that happens in a
+    worker thread so inserts never block the loop for the seconds k-means takes.
+    """
+
+    def __init__(self, dim: int = 32, n_lists: Optional[int] = None, nprobe: int = 8,
+                 min_train_size: int = 2048, seed: int = 0):
+        self.dim = dim
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self._rng = np.random.default_rng(seed)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[FeatureIndex] = [FeatureIndex(dim)]
+        self._list_of: Dict[str, int] = {}
+        self._trained_size = 0
+        self._training: Optional[asyncio.Task] = None
+        # Changes made while a background training runs, replayed onto its result: item id -> vector, or None if removed
+        self._pending: Optional[Dict[str, Optional[np.ndarray]]] = None
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._list_of)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._list_of
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    @staticmethod
+    def _nearest_lists(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        # Chunked so the vectors x centroids score matrix stays bounded in memory
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            scores = vectors[start:start + chunk_size] @ centroids.T
+            assignments[start:start + chunk_size] = np.argmax(scores, axis=1)
+        return assignments
+
+    def _kmeans(self, vectors: np.ndarray, n_lists: int, iterations: int = 10) -> np.ndarray:
+        # Spherical k-means: centroids are re-normalised so dot products stay cosines
+        centroids = vectors[self._rng.choice(len(vectors), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            counts = np.bincount(assignments, minlength=n_lists)
+
+            # Reseed empty lists from random vectors
+            empty = np.flatnonzero(counts == 0)
+            if empty.size:
+                sums[empty] = vectors[self._rng.choice(len(vectors), empty.size)]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+        return centroids.astype(np.float32)
+
+    def _snapshot(self) -> Tuple[List[str], np.ndarray]:
+        """Copy out every stored id and vector"""
+        ids, vectors = [], []
+        for index in self._lists:
+            list_ids, list_vectors = index.vectors()
+            ids.extend(list_ids)
+            vectors.append(list_vectors)
+        return ids, np.concatenate(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32)
+
+    def _partition(self, ids: List[str], vectors: np.ndarray):
+        """Cluster a snapshot into new centroids and lists without touching the live index"""
+        n_lists = self.n_lists or int(np.sqrt(len(vectors)))
+        # Training on a sample keeps retraining cheap; every vector is still assigned below
+        sample_size = min(len(vectors), 64 * n_lists)
+        sample = vectors[self._rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = self._kmeans(sample, n_lists)
+
+        # Group rows by list so each list is filled with one copy rather than an insert per vector
+        assignments = self._nearest_lists(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+        lists = []
+        for list_id in range(n_lists):
+            rows = order[bounds[list_id]:bounds[list_id + 1]]
+            lists.append(FeatureIndex.from_vectors([ids[row] for row in rows], vectors[rows]))
+        return centroids, lists, dict(zip(ids, assignments.tolist()))
+
+    def train(self):
+        """Recompute the partitioning from every stored vector and redistribute them"""
+        ids, vectors = self._snapshot()
+        if len(vectors) < self.min_train_size:
+            return
+        self._centroids, self._lists, self._list_of = self._partition(ids, vectors)
+        self._trained_size = len(vectors)
+
+    @staticmethod
+    def _apply(partition, item_id: str, vector: Optional[np.ndarray]):
+        """Replay one change onto a (centroids, lists, list_of) partition; a None vector removes the item"""
+        centroids, lists, list_of = partition
+        list_id = list_of.pop(item_id, None)
+        if list_id is not None:
+            lists[list_id].remove(item_id)
+        if vector is not None:
+            list_id = int(np.argmax(centroids @ vector))
+            lists[list_id].add(item_id, vector)
+            list_of[item_id] = list_id
+
+    async def train_in_background(self, replay_batch: int = 1000):
+        """Train in a worker thread on a snapshot, then swap the new partitioning in
+
+        Items added or removed meanwhile are replayed onto the new partitioning in batches,
+        yielding to the event loop between them, and it is swapped in once only a batch is
+        left to replay. A clear() meanwhile discards it.
+        """
+        ids, vectors = self._snapshot()
+        if len(vectors) < self.min_train_size:
+            return
+        generation = self._generation
+        self._pending = {}
+        try:
+            partition = await asyncio.to_thread(self._partition, ids, vectors)
+            while len(self._pending) > replay_batch:
+                pending, self._pending = self._pending, {}
+                for count, (item_id, vector) in enumerate(pending.items(), 1):
+                    self._apply(partition, item_id, vector)
+                    if count % replay_batch == 0:
+                        await asyncio.sleep(0)
+            if generation != self._generation:
+                return
+
+            for item_id, vector in self._pending.items():
+                self._apply(partition, item_id, vector)
+            self._centroids, self._lists, self._list_of = partition
+            self._trained_size = len(vectors)
+        finally:
+            self._pending = None
+
+        # The index may have doubled again while this training ran
+        if len(self) >= 2 * self._trained_size:
+            self._schedule_training()
+
+    async def _train_task(self):
+        try:
+            await self.train_in_background()
+        except Exception as e:
+            print(f"IVF training error: {e}")
+
+    def _schedule_training(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, benchmarks): train inline
+            self.train()
+            return
+        self._training = asyncio.create_task(self._train_task())
+
+    def add(self, item_id: str, vector: Sequence[float]) -> bool:
+        """Insert or replace an item, assigning it to its nearest list"""
+        normalized = FeatureIndex.normalize(vector)
+        if normalized is None or normalized.shape[0] != self.dim:
+            return False
+
+        self.remove(item_id)
+        list_id = 0
+        if self.trained:
+            list_id = int(np.argmax(self._centroids @ normalized))
+        self._lists[list_id].add(item_id, normalized)
+        self._list_of[item_id] = list_id
+        if self._pending is not None:
+            self._pending[item_id] = normalized
+
+        training = self._training is not None and not self._training.done()
+        if not training and len(self) >= max(self.min_train_size, 2 * self._trained_size):
+            self._schedule_training()
+        return True
+
+    def remove(self, item_id: str) -> bool:
+        if self._pending is not None:
+            self._pending[item_id] = None
+        list_id = self._list_of.pop(item_id, None)
+        if list_id is None:
+            return False
+        return self._lists[list_id].remove(item_id)
+
+    def clear(self):
+        self._centroids = None
+        self._lists = [FeatureIndex(self.dim)]
+        self._list_of = {}
+        self._trained_size = 0
+        self._generation += 1
+
+    @contextmanager
+    def rebuilding(self):
+        """Clear the index for a full reload; items are added to the yielded index"""
+        self.clear()
+        yield self
+
+    def search(self, query: Sequence[float], k: int = 15, threshold: float = 0.2,
+               nprobe: Optional[int] = None, **options) -> List[Tuple[str, float]]:
+        """Return up to k approximate (item_id, cosine similarity) pairs, best first"""
+        if not self.trained:
+            return self._lists[0].search(query, k, threshold)
+
+        normalized = FeatureIndex.normalize(query)
+        if normalized is None:
+            return []
+
+        nprobe = min(nprobe or self.nprobe, len(self._lists))
+        centroid_scores = self._centroids @ normalized
+        probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        results = []
+        for list_id in probed:
+            results.extend(self._lists[list_id].search(normalized, k, threshold))
+        results.sort(key=lambda result: result[1], reverse=True)
+        return results[:k]
+
+
+class SharedFeatureIndex:
+    """Exact feature index in memory-mapped files, one copy shared by every worker process on a host
+
+    Vectors and item ids are rows of append-only files for the current epoch. A small meta
+    file holds the epoch and committed row count behind a sequence counter, so readers
+    take a consistent snapshot without locking and search the mapped pages in place.
+    Writes hold an exclusive file lock, so there is a single writer at any moment: a row
+    is written before the count that publishes it, and replacing or removing an item
+    zeroes its old row rather than rewriting it under concurrent readers. Rebuilds stage
+    a new epoch privately and switch to it atomically, which also compacts the files.
+    """
+
+    def __init__(self, directory: str, name: str, dim: int = 32, initial_capacity: int = 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = name
+        self.dim = dim
+        self.initial_capacity = initial_capacity
+        self._lock_fd = os.open(self._path("lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        self._epoch: Optional[int] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+        # Item id -> newest row, caught up from the ids file as other workers append
+        self._rows: Dict[str, int] = {}
+        self._known = 0
+
+        with self._locked():
+            meta_path = self._path("meta")
+            if not os.path.exists(meta_path) or os.path.getsize(meta_path) != META_SLOTS * 8:
+                np.zeros(META_SLOTS, dtype=np.uint64).tofile(meta_path)
+            self._meta = np.memmap(meta_path, dtype=np.uint64, mode="r+", shape=(META_SLOTS,))
+            epoch = int(self._meta[META_EPOCH])
+            # A new index, or one left behind with another dimension, starts out empty
+            if int(self._meta[META_DIM]) != dim or not os.path.exists(self._path("ids", epoch)):
+                self._meta[META_DIM] = dim
+                self._publish(self._create_epoch(), 0, 0, built_at=0)
+
+    def _path(self, kind: str, epoch: Optional[int] = None) -> str:
+        name = self.name if epoch is None else f"{self.name}.{epoch}"
+        return os.path.join(self.directory, f"{name}.{kind}")
+
+    @contextmanager
+    def _locked(self):
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _create_epoch(self) -> int:
+        while True:
+            epoch = time.time_ns()
+            try:
+                open(self._path("ids", epoch), "xb").close()
+                break
+            except FileExistsError:
+                continue
+        open(self._path("vectors", epoch), "wb").close()
+        self._resize(epoch, self.initial_capacity)
+        return epoch
+
+    def _resize(self, epoch: int, capacity: int):
+        # The ids file is grown last: readers size their mapping from it
+        os.truncate(self._path("vectors", epoch), capacity * self.dim * 4)
+        os.truncate(self._path("ids", epoch), capacity * SHARED_ID_BYTES)
+
+    def _open(self, epoch: int) -> Tuple[np.ndarray, np.ndarray]:
+        capacity = os.path.getsize(self._path("ids", epoch)) // SHARED_ID_BYTES
+        vectors = np.memmap(self._path("vectors", epoch), dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        ids = np.memmap(self._path("ids", epoch), dtype=f"S{SHARED_ID_BYTES}", mode="r+", shape=(capacity,))
+        return vectors, ids
+
+    def _publish(self, epoch: int, count: int, live: int, built_at: Optional[int] = None):
+        """Update the meta file under the write lock; an odd sequence number marks an update in progress"""
+        meta = self._meta
+        sequence = int(meta[META_SEQUENCE]) | 1
+        meta[META_SEQUENCE] = sequence
+        previous = int(meta[META_EPOCH])
+        meta[META_EPOCH] = epoch
+        meta[META_COUNT] = count
+        meta[META_LIVE] = live
+        if built_at is not None:
+            meta[META_BUILT_AT] = built_at
+        meta[META_SEQUENCE] = sequence + 1
+
+        # Workers still mapping the old epoch keep its pages until they remap
+        if previous != epoch:
+            for kind in ("vectors", "ids"):
+                try:
+                    os.remove(self._path(kind, previous))
+                except FileNotFoundError:
+                    pass
+
+    def _snapshot(self, spins: int = 1000) -> Tuple[int, int, int]:
+        """Read (epoch, row count, live count) without locking, retrying while a writer is mid-update"""
+        meta = self._meta
+        for _ in range(spins):
+            sequence = int(meta[META_SEQUENCE])
+            if sequence % 2 == 0:
+                snapshot = int(meta[META_EPOCH]), int(meta[META_COUNT]), int(meta[META_LIVE])
+                if int(meta[META_SEQUENCE]) == sequence:
+                    return snapshot
+        # A writer that died mid-update leaves the sequence odd; holding the lock rules out live writers
+        with self._locked():
+            return int(meta[META_EPOCH]), int(meta[META_COUNT]), int(meta[META_LIVE])
+
+    def _sync(self) -> int:
+        """Follow other writers: remap after a rebuild or growth and index newly appended ids; returns the row count"""
+        while True:
+            epoch, count, live = self._snapshot()
+            try:
+                if epoch != self._epoch or count > len(self._ids):
+                    self._vectors, self._ids = self._open(epoch)
+                break
+            except FileNotFoundError:
+                # Replaced by a rebuild between the snapshot and the mapping
+                continue
+        if epoch != self._epoch:
+            self._epoch, self._rows, self._known = epoch, {}, 0
+
+        if count > self._known:
+            for row, raw in enumerate(self._ids[self._known:count].tolist(), self._known):
+                if raw:
+                    self._rows[raw.decode()] = row
+            self._known = count
+        return count
+
+    def _row(self, item_id: str) -> Optional[int]:
+        row = self._rows.get(item_id)
+        if row is not None and self._ids[row] != item_id.encode():
+            # Removed by another worker since this one indexed it
+            del self._rows[item_id]
+            return None
+        return row
+
+    def _clear_row(self, row: int):
+        self._ids[row] = b""
+        self._vectors[row] = 0
+
+    def __len__(self) -> int:
+        return self._snapshot()[2]
+
+    def __contains__(self, item_id: str) -> bool:
+        self._sync()
+        return self._row(item_id) is not None
+
+    def built_after(self, timestamp: float) -> bool:
+        """Whether the last full rebuild started at or after a time.time() timestamp"""
+        return int(self._meta[META_BUILT_AT]) >= int(timestamp * 1e9)
+
+    def changes(self, epoch: Optional[int], known: int) -> Tuple[int, int, List[Tuple[str, np.ndarray]]]:
+        """Rows appended since a caller's (epoch, row count) position, for mirroring the index in another structure
+
+        Returns the current epoch, its row count and the new live (item_id, vector) rows; after a
+        rebuild switched epochs every live row is returned and the caller starts over.
+        """
+        count = self._sync()
+        start = known if epoch == self._epoch else 0
+        rows = [
+            (raw.decode(), np.array(self._vectors[row]))
+            for row, raw in enumerate(self._ids[start:count].tolist(), start) if raw
+        ]
+        return self._epoch, count, rows
+
+    def add(self, item_id: str, vector: Sequence[float]) -> bool:
+        """Insert or replace the vector stored for an item; it is visible to every worker on return"""
+        vector = FeatureIndex.normalize(vector)
+        if vector is None or vector.shape[0] != self.dim:
+            return False
+        key = item_id.encode()
+        if len(key) > SHARED_ID_BYTES:
+            raise ValueError(f"Item ids are limited to {SHARED_ID_BYTES} bytes in a shared feature index")
+
+        with self._locked():
+            count = self._sync()
+            live = int(self._meta[META_LIVE])
+            row = self._row(item_id)
+            if row is not None:
+                self._clear_row(row)
+                live -= 1
+            if count == len(self._ids):
+                self._resize(self._epoch, 2 * count)
+                self._vectors, self._ids = self._open(self._epoch)
+
+            self._vectors[count] = vector
+            self._ids[count] = key
+            self._rows[item_id] = count
+            self._known = count + 1
+            self._publish(self._epoch, count + 1, live + 1)
+        return True
+
+    def remove(self, item_id: str) -> bool:
+        with self._locked():
+            count = self._sync()
+            row = self._row(item_id)
+            if row is None:
+                return False
+            self._clear_row(row)
+            del self._rows[item_id]
+            self._publish(self._epoch, count, int(self._meta[META_LIVE]) - 1)
+        return True
+
+    def clear(self):
+        with self.rebuilding():
+            pass
+
+    @contextmanager
+    def rebuilding(self):
+        """Stage a full reload in a new epoch, switched to atomically on exit; items are added to the yielded stage
+
+        Searches keep using the current epoch meanwhile. Items other workers add during the
+        rebuild are carried over at the switch; removals made during it are not.
+        """
+        started = time.time_ns()
+        with self._locked():
+            start_count = self._sync()
+            start_epoch = self._epoch
+        stage = StagedEpoch(self)
+        try:
+            yield stage
+        except BaseException:
+            stage.discard()
+            raise
+
+        with self._locked():
+            count = self._sync()
+            # Another worker may have switched epochs meanwhile; its items fill in any this rebuild lacks
+            same_epoch = self._epoch == start_epoch
+            for row, raw in enumerate(self._ids[:count].tolist()):
+                if raw and (row >= start_count if same_epoch else raw.decode() not in stage):
+                    stage.add(raw.decode(), self._vectors[row])
+            stage.flush()
+            self._publish(stage.epoch, stage.count, len(stage), built_at=started)
+            self._sync()
+
+    @asynccontextmanager
+    async def build_lock(self, poll: float = 0.5):
+        """Hold the host-wide rebuild lock, polling so a waiting worker keeps serving requests
+
+        While it is held no other rebuild is staging, so epoch files left by crashed rebuilds are removed.
+        """
+        fd = os.open(self._path("build.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(poll)
+
+            current = self._snapshot()[0]
+            pattern = re.compile(rf"{re.escape(self.name)}\.(\d+)\.(vectors|ids)$")
+            for filename in os.listdir(self.directory):
+                match = pattern.match(filename)
+                if match and int(match.group(1)) != current:
+                    os.remove(os.path.join(self.directory, filename))
+            yield
+        finally:
+            # Closing the descriptor releases the lock
+            os.close(fd)
+
+    def search(self, query: Sequence[float], k: int = 15, threshold: float = 0.2,
+               ids: Optional[Collection[str]] = None, **options) -> List[Tuple[str, float]]:
+        """Return up to k (item_id, cosine similarity) pairs at or above threshold, best first
+
+        ids restricts the search to those items (ids not in this index are ignored).
+        """
+        query = FeatureIndex.normalize(query)
+        count = self._sync()
+        if query is None or count == 0:
+            return []
+
+        # Scored straight from the shared pages; no per-process copy of the matrix
+        if ids is None:
+            rows = np.arange(count)
+            scores = np.asarray(self._vectors[:count] @ query)
+        else:
+            rows = np.fromiter((row for row in map(self._row, ids) if row is not None), dtype=np.int64)
+            scores = np.asarray(self._vectors[rows] @ query)
+        # Cleared rows are zero vectors, which only a non-positive threshold would let through
+        if threshold <= 0:
+            scores[self._ids[rows] == b""] = -np.inf
+        return [(self._ids[rows[candidate]].decode(), float(scores[candidate])) for candidate in top_k(scores, k, threshold)]
+
+
+class StagedEpoch:
+    """Private epoch files a SharedFeatureIndex rebuild writes into before they are published"""
+
+    def __init__(self, index: SharedFeatureIndex):
+        self.index = index
+        self.epoch = index._create_epoch()
+        self._vectors, self._ids = index._open(self.epoch)
+        self._rows: Dict[str, int] = {}
+        self.count = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._rows
+
+    def add(self, item_id: str, vector: Sequence[float]) -> bool:
+        """Insert or replace an item; nobody else maps these files yet, so rows are rewritten in place"""
+        vector = FeatureIndex.normalize(vector)
+        if vector is None or vector.shape[0] != self.index.dim:
+            return False
+        key = item_id.encode()
+        if len(key) > SHARED_ID_BYTES:
+            raise ValueError(f"Item ids are limited to {SHARED_ID_BYTES} bytes in a shared feature index")
+
+        row = self._rows.get(item_id)
+        if row is None:
+            if self.count == len(self._ids):
+                self.index._resize(self.epoch, 2 * self.count)
+                self._vectors, self._ids = self.index._open(self.epoch)
+            row = self.count
+            self.count += 1
+            self._ids[row] = key
+            self._rows[item_id] = row
+        self._vectors[row] = vector
+        return True
+
+    def flush(self):
+        self._vectors.flush()
+        self._ids.flush()
+
+    def discard(self):
+        for kind in ("vectors", "ids"):
+            os.remove(self.index._path(kind, self.epoch))
+
+
+def create_feature_index(backend: str = "exact", dim: int = 32, directory: Optional[str] = None,
+                         name: Optional[str] = None, **options):
+    """Build a feature index for the configured backend ('exact' or 'ivf'); options only apply to ivf
+
+    With a directory, an exact index is kept in memory-mapped files there under name and
+    shared by every process that opens it.
+    """
+    if directory and backend != "exact":
+        raise ValueError(f"Shared feature indexes only support the exact backend, not: {backend}")
+    if backend == "ivf":
+        return IVFFeatureIndex(dim, **options)
+    if backend == "exact":
+        return SharedFeatureIndex(directory, name, dim) if directory else FeatureIndex(dim)
+    raise ValueError(f"Unknown feature index backend: {backend}")
+
+
+def search_indexes(indexes: Sequence, query: Sequence[float], k: int = 15, threshold: float = 0.2,
+                   **options) -> List[Tuple[int, str, float]]:
+    """Search several indexes and merge into one global top-k of (index position, item_id, score)"""
+    results = []
+    for position, index in enumerate(indexes):
+        results.extend((position, item_id, score) for item_id, score in index.search(query, k, threshold, **options))
+    results.sort(key=lambda result: result[2], reverse=True)
+    return results[:k]
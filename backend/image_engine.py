@@ -0,0 +1,147 @@
+import binascii
+import re
+import cv2
+import numpy as np
+from typing import NamedTuple, Optional, List, Union
+from io import BytesIO
+from PIL import Image
+
+from fastapi import HTTPException
+
+from descriptor_match import pack_descriptors
+
+# Side of the square grayscale image ORB features are computed on
+FEATURE_SIZE = 300
+
+# Hue, saturation and value bins of the colour histogram, and the thumbnail side it is computed on
+HISTOGRAM_BINS = (8, 4, 4)
+HISTOGRAM_DIM = HISTOGRAM_BINS[0] * HISTOGRAM_BINS[1] * HISTOGRAM_BINS[2]
+HISTOGRAM_SIZE = 64
+
+BASE64_PATTERN = re.compile(r"[A-Za-z0-9+/]*={0,2}")
+
+
+class ImageSignature(NamedTuple):
+    """Everything visual search stores for an item image, from a single decode"""
+    features: Optional[List[float]]
+    descriptors: Optional[bytes]
+    histogram: Optional[List[float]]
+
+
+def decode_image_data(image: str) -> bytes:
+    """Decode a base64 image, with or without a data URL prefix, raising ValueError if invalid
+    
+    Uploads, visual search queries and embedded legacy images all decode here. The string is
+    validated and decoded in place (a2b_base64 reads an ASCII str without encoding it first);
+    only stripping a data URL prefix copies the payload, once.
+    """
+    if image.startswith('data:'):
+        image = image[image.find(',') + 1:]
+    if not BASE64_PATTERN.fullmatch(image):
+        raise ValueError("Invalid image data: not a base64 string")
+    try:
+        return binascii.a2b_base64(image)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Invalid image data: {e}")
+
+
+# Image Processing Utilities
+class ImageSimilarityEngine:
+    def __init__(self):
+        # Initialize ORB detector for feature extraction
+        self.orb = cv2.ORB_create(nfeatures=500)
+    
+    def decode_reduced(self, image: Union[str, bytes], mode: str, size: int = FEATURE_SIZE) -> Image.Image:
+        """Decode a base64 string or encoded bytes to a PIL image in mode, at least size x size
+        
+        JPEGs are scaled down by the decoder in the DCT domain (and decoded directly to luma
+        for mode L), so a phone photo is never held in memory at full resolution.
+        """
+        try:
+            data = image if isinstance(image, bytes) else decode_image_data(image)
+            pil_image = Image.open(BytesIO(data))
+            pil_image.draft(mode, (size, size))
+            if pil_image.mode != mode:
+                pil_image = pil_image.convert(mode)
+            return pil_image
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid image format: {str(e)}")
+    
+    def decode_grayscale(self, image: Union[str, bytes], size: int = FEATURE_SIZE) -> np.ndarray:
+        """Decode a base64 string or encoded bytes straight to a grayscale array of at least size x size"""
+        return np.asarray(self.decode_reduced(image, 'L', size))
+    
+    def color_histogram(self, image: Image.Image) -> List[float]:
+        """HSV colour histogram of an RGB image, square-rooted so it has unit length
+        
+        The dot product of two such vectors is the Bhattacharyya coefficient of the
+        histograms, so they can be ranked by a cosine feature index.
+        """
+        thumbnail = image.copy()
+        thumbnail.thumbnail((HISTOGRAM_SIZE, HISTOGRAM_SIZE))
+        hsv = np.asarray(thumbnail.convert('HSV')).reshape(-1, 3).astype(np.int32)
+        hue, saturation, value = (hsv * np.array(HISTOGRAM_BINS) // 256).T
+        bins = (hue * HISTOGRAM_BINS[1] + saturation) * HISTOGRAM_BINS[2] + value
+        histogram = np.bincount(bins, minlength=HISTOGRAM_DIM).astype(np.float32)
+        return np.sqrt(histogram / histogram.sum()).tolist()
+    
+    def orb_descriptors(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """Binary ORB descriptors (n x 32 uint8) of a grayscale or BGR image"""
+        try:
+            # Convert to grayscale
+            gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            
+            # Resize image to standard size for consistency
+            gray = cv2.resize(gray, (FEATURE_SIZE, FEATURE_SIZE))
+            
+            # Detect keypoints and compute descriptors
+            keypoints, descriptors = self.orb.detectAndCompute(gray, None)
+            
+            # If we have fewer than 10 descriptors, the image might not be suitable
+            if descriptors is None or len(descriptors) < 10:
+                return None
+            return descriptors
+        except Exception as e:
+            print(f"Feature extraction error: {e}")
+            return None
+    
+    def extract_features(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """Extract ORB features from a grayscale or BGR image"""
+        descriptors = self.orb_descriptors(image)
+        if descriptors is None:
+            return None
+        
+        # Take mean of descriptors to create a fixed-size feature vector
+        return np.mean(descriptors, axis=0)
+    
+    def compute_features(self, image: Optional[Union[str, bytes]]) -> Optional[List[float]]:
+        """Decode a base64 or encoded image and return its feature vector ready for storage"""
+        if not image:
+            return None
+        try:
+            image = self.decode_grayscale(image)
+        except HTTPException:
+            return None
+        
+        features = self.extract_features(image)
+        if features is None:
+            return None
+        return features.tolist()
+    
+    def compute_signature(self, image: Optional[Union[str, bytes]]) -> ImageSignature:
+        """Decode a base64 or encoded image once and return its signature ready for storage"""
+        if not image:
+            return ImageSignature(None, None, None)
+        try:
+            color = self.decode_reduced(image, 'RGB')
+        except HTTPException:
+            return ImageSignature(None, None, None)
+        return self.image_signature(color)
+    
+    def image_signature(self, color: Image.Image) -> ImageSignature:
+        """Mean feature vector, packed ORB descriptors and colour histogram of a decoded RGB image"""
+        histogram = self.color_histogram(color)
+        descriptors = self.orb_descriptors(np.asarray(color.convert('L')))
+        if descriptors is None:
+            return ImageSignature(None, None, histogram)
+        return ImageSignature(np.mean(descriptors, axis=0).tolist(), pack_descriptors(descriptors), histogram)
@@ -0,0 +1,225 @@
+from contextlib import contextmanager
+from io import BytesIO
+from itertools import combinations
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+from feature_index import SharedFeatureIndex
+
+HASH_BITS = 64
+
+
+def dhash(data: bytes, size: int = 8) -> int:
+    """64-bit difference hash of an encoded image
+
+    Each bit records whether a pixel of a 9x8 grayscale thumbnail is brighter than its
+    right-hand neighbour, so the hash survives rescaling, recompression and small edits.
+    """
+    image = Image.open(BytesIO(data))
+    # Only a tiny thumbnail is needed, so let the JPEG decoder scale down while decoding
+    image.draft("L", (size * 8, size * 8))
+    pixels = list(image.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for column in range(size):
+            value = (value << 1) | (pixels[offset + column] > pixels[offset + column + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def format_hash(value: int) -> str:
+    """Hashes are stored as fixed-width hex; 64-bit unsigned values do not fit BSON int64"""
+    return format(value, "016x")
+
+
+def parse_hash(value: str) -> int:
+    return int(value, 16)
+
+
+def is_informative(value: int, min_bits: int = 8) -> bool:
+    """Flat or nearly flat images hash to almost all zeros (or ones) and would all match each other"""
+    bits = bin(value).count("1")
+    return min_bits <= bits <= HASH_BITS - min_bits
+
+
+class MultiIndexHash:
+    """Multi-index hash table of 64-bit image hashes for Hamming-radius lookups
+
+    Hashes are split into equal substrings, each indexed in its own table. By the
+    pigeonhole principle a hash within radius r of a query matches it on at least one
+    substring to within r // chunks bits, so a lookup probes only those few keys per
+    table and verifies the handful of candidates it finds.
+    """
+
+    def __init__(self, chunks: int = 4):
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self._masks: Dict[int, List[int]] = {}
+        self.clear()
+
+    def clear(self):
+        self._tables: List[Dict[int, Set[str]]] = [{} for _ in range(self.chunks)]
+        self._hash_of: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._hash_of)
+
+    @contextmanager
+    def rebuilding(self):
+        """Clear the index for a full reload; items are added to the yielded index"""
+        self.clear()
+        yield self
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._hash_of
+
+    def _keys(self, value: int) -> List[int]:
+        mask = (1 << self.chunk_bits) - 1
+        return [(value >> (chunk * self.chunk_bits)) & mask for chunk in range(self.chunks)]
+
+    def _flip_masks(self, distance: int) -> List[int]:
+        """Every substring mask with at most distance bits set"""
+        if distance not in self._masks:
+            masks = []
+            for bits in range(distance + 1):
+                for positions in combinations(range(self.chunk_bits), bits):
+                    masks.append(sum(1 << position for position in positions))
+            self._masks[distance] = masks
+        return self._masks[distance]
+
+    def add(self, item_id: str, value: int):
+        """Insert an item's hash, replacing any hash stored for it before"""
+        self.remove(item_id)
+        self._hash_of[item_id] = value
+        for table, key in zip(self._tables, self._keys(value)):
+            table.setdefault(key, set()).add(item_id)
+
+    def remove(self, item_id: str) -> bool:
+        value = self._hash_of.pop(item_id, None)
+        if value is None:
+            return False
+        for table, key in zip(self._tables, self._keys(value)):
+            bucket = table[key]
+            bucket.discard(item_id)
+            if not bucket:
+                del table[key]
+        return True
+
+    def search(self, value: int, radius: int) -> List[Tuple[str, int]]:
+        """Return (item_id, distance) pairs within radius of value, nearest first"""
+        masks = self._flip_masks(radius // self.chunks)
+        candidates: Set[str] = set()
+        for table, key in zip(self._tables, self._keys(value)):
+            for mask in masks:
+                bucket = table.get(key ^ mask)
+                if bucket:
+                    candidates |= bucket
+
+        results = []
+        for item_id in candidates:
+            distance = hamming(value, self._hash_of[item_id])
+            if distance <= radius:
+                results.append((item_id, distance))
+        results.sort(key=lambda result: (result[1], result[0]))
+        return results
+
+
+def hash_vector(value: int) -> np.ndarray:
+    """A hash as a vector of +1/-1 bits, so it can be stored in a feature index"""
+    bits = (value >> np.arange(HASH_BITS, dtype=np.uint64)) & np.uint64(1)
+    return bits.astype(np.float32) * 2 - 1
+
+
+def vector_hash(vector: np.ndarray) -> int:
+    """The hash a (possibly normalised) hash_vector was made from"""
+    bits = (np.asarray(vector) > 0).astype(np.uint64)
+    return int((bits << np.arange(HASH_BITS, dtype=np.uint64)).sum())
+
+
+class SharedHashIndex:
+    """Image hashes in a SharedFeatureIndex, so every worker process on a host sees every other's
+
+    The shared file is the source of truth; each process mirrors it in its own MultiIndexHash,
+    catching up on rows appended since its last lookup (or starting over after a rebuild
+    switched epochs), so lookups stay sublinear. Mirrored matches are checked against the
+    shared file, which drops items another worker removed.
+    """
+
+    def __init__(self, directory: str, name: str):
+        self.vectors = SharedFeatureIndex(directory, name, HASH_BITS)
+        self._mirror = MultiIndexHash()
+        self._epoch: Optional[int] = None
+        self._known = 0
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.vectors
+
+    def built_after(self, timestamp: float) -> bool:
+        return self.vectors.built_after(timestamp)
+
+    def build_lock(self):
+        return self.vectors.build_lock()
+
+    def add(self, item_id: str, value: int):
+        """Insert an item's hash, replacing any hash stored for it before; visible to every worker on return"""
+        self.vectors.add(item_id, hash_vector(value))
+
+    def remove(self, item_id: str) -> bool:
+        self._mirror.remove(item_id)
+        return self.vectors.remove(item_id)
+
+    def clear(self):
+        self.vectors.clear()
+
+    @contextmanager
+    def rebuilding(self):
+        """Stage a full reload, switched to atomically on exit; items are added to the yielded index"""
+        with self.vectors.rebuilding() as stage:
+            yield StagedHashes(stage)
+
+    def _catch_up(self):
+        epoch, count, rows = self.vectors.changes(self._epoch, self._known)
+        if epoch != self._epoch:
+            self._mirror.clear()
+        for item_id, vector in rows:
+            self._mirror.add(item_id, vector_hash(vector))
+        self._epoch, self._known = epoch, count
+
+    def search(self, value: int, radius: int) -> List[Tuple[str, int]]:
+        """Return (item_id, distance) pairs within radius of value, nearest first"""
+        self._catch_up()
+        results = []
+        for item_id, distance in self._mirror.search(value, radius):
+            if item_id in self.vectors:
+                results.append((item_id, distance))
+            else:
+                self._mirror.remove(item_id)
+        return results
+
+
+class StagedHashes:
+    """The hash view of a SharedFeatureIndex rebuild stage"""
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __len__(self) -> int:
+        return len(self.stage)
+
+    def add(self, item_id: str, value: int):
+        self.stage.add(item_id, hash_vector(value))
+
+
+def create_hash_index(directory: Optional[str] = None, name: Optional[str] = None):
+    """An in-process MultiIndexHash, or with a directory a SharedHashIndex kept there under name"""
+    return SharedHashIndex(directory, name) if directory else MultiIndexHash()
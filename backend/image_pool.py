@@ -0,0 +1,200 @@
+import asyncio
+import os
+import multiprocessing
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Dict, List, Optional, Sequence, Union
+
+import cv2
+from fastapi import HTTPException
+from PIL import Image
+
+from descriptor_match import match_scores, unpack_descriptors
+from image_engine import ImageSignature, ImageSimilarityEngine
+from image_hash import dhash
+
+# Per-process engine, created once by the pool initializer so each worker builds its ORB detector a single time
+_engine: Optional[ImageSimilarityEngine] = None
+
+# Raised by Image.open for images above the worker's pixel cap
+DECOMPRESSION_BOMB = (Image.DecompressionBombError, Image.DecompressionBombWarning)
+DEFAULT_MAX_PIXELS = 50_000_000
+
+
+def _init_worker(max_pixels: int = DEFAULT_MAX_PIXELS):
+    global _engine
+    # Parallelism comes from the pool; keep OpenCV from oversubscribing cores inside each worker
+    cv2.setNumThreads(1)
+    # Draft mode only bounds JPEG decodes, so refuse any image whose header declares more pixels
+    # than a worker can hold, rather than letting one upload get the worker OOM-killed
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    warnings.simplefilter("error", Image.DecompressionBombWarning)
+    _engine = ImageSimilarityEngine()
+
+
+def _extract_batch(images: Sequence[Optional[Union[str, bytes]]]) -> List[Optional[List[float]]]:
+    """Worker: feature vectors for a batch of base64 or encoded images, None where extraction fails"""
+    return [_engine.compute_features(image) for image in images]
+
+
+def _signature_batch(images: Sequence[Optional[Union[str, bytes]]]) -> List[ImageSignature]:
+    """Worker: features, packed ORB descriptors and colour histogram for a batch of images, Nones where extraction fails"""
+    return [_engine.compute_signature(image) for image in images]
+
+
+def _query_signature(image: Union[str, bytes]) -> ImageSignature:
+    """Worker: signature of an uploaded query image, raising ValueError if it cannot be decoded"""
+    try:
+        decoded = _engine.decode_reduced(image, "RGB")
+    except HTTPException as e:
+        # Plain exceptions pickle reliably back to the parent process
+        raise ValueError(e.detail)
+    return _engine.image_signature(decoded)
+
+
+def _match_descriptors(query: bytes, candidates: Sequence[Optional[bytes]]) -> List[float]:
+    """Worker: ratio-tested Hamming match scores of candidate descriptors against a query's"""
+    scores = match_scores(unpack_descriptors(query), [unpack_descriptors(data) for data in candidates])
+    return scores.tolist()
+
+
+def _render_renditions(data: bytes, sizes: Sequence[int], image_format: str = "JPEG", quality: int = 80) -> Dict[int, bytes]:
+    """Worker: encode downscaled renditions of an image, skipping sizes at or above the original"""
+    image = Image.open(BytesIO(data))
+    # Let the JPEG decoder scale down in the DCT domain before we resize precisely
+    image.draft("RGB", (max(sizes), max(sizes)))
+    image = image.convert("RGB")
+
+    renditions = {}
+    for size in sorted(sizes, reverse=True):
+        if max(image.size) <= size:
+            continue
+        rendition = image.copy()
+        rendition.thumbnail((size, size), Image.LANCZOS)
+        buffer = BytesIO()
+        rendition.save(buffer, format=image_format, quality=quality)
+        renditions[size] = buffer.getvalue()
+    return renditions
+
+
+def _hash_batch(images: Sequence[bytes]) -> List[Optional[int]]:
+    """Worker: difference hashes of encoded images, None where an image cannot be decoded"""
+    hashes = []
+    for data in images:
+        try:
+            hashes.append(dhash(data))
+        except (OSError, ValueError) + DECOMPRESSION_BOMB:
+            hashes.append(None)
+    return hashes
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class ImagePool:
+    """Runs CPU-bound image decoding and feature extraction in worker processes
+
+    queue_depth caps how many batches may be submitted at once; further callers wait
+    for a slot, so a burst of visual searches applies backpressure instead of piling
+    unbounded work onto the pool while cheap endpoints keep running on the event loop.
+    A worker that dies (say OOM-killed mid-decode) breaks the whole executor, so it is
+    replaced with a fresh one and the interrupted call retried once.
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_depth: Optional[int] = None, batch_size: int = 16,
+                 max_pixels: int = DEFAULT_MAX_PIXELS):
+        self.workers = workers or available_cores()
+        self.queue_depth = queue_depth or self.workers * 2
+        self.batch_size = batch_size
+        self.max_pixels = max_pixels
+        self.restarts = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._restart_lock: Optional[asyncio.Lock] = None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Spawned workers import only the image modules, not the web app and its database client,
+        # as long as the app is not the __main__ script (see the __main__ block of server.py)
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.max_pixels,)
+        )
+
+    def start(self):
+        if self._executor is None:
+            self._executor = self._new_executor()
+            self._slots = asyncio.Semaphore(self.queue_depth)
+            self._restart_lock = asyncio.Lock()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._slots = None
+            self._restart_lock = None
+
+    async def _replace(self, broken: ProcessPoolExecutor):
+        """Swap a broken executor for a new one; callers that hit the same breakage replace it only once"""
+        async with self._restart_lock:
+            if self._executor is broken:
+                print("Image pool worker died; starting a new pool")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+                self.restarts += 1
+
+    async def _submit(self, func, *args):
+        self.start()
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            executor = self._executor
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                await self._replace(executor)
+                return await loop.run_in_executor(self._executor, func, *args)
+
+    async def signature(self, image: Optional[Union[str, bytes]]) -> ImageSignature:
+        """Feature vector, packed ORB descriptors and colour histogram of an item image from a single decode"""
+        if not image:
+            return ImageSignature(None, None, None)
+        return (await self._submit(_signature_batch, [image]))[0]
+
+    async def signature_many(self, images: Sequence[Optional[Union[str, bytes]]]) -> List[ImageSignature]:
+        return await self._map_batches(_signature_batch, images)
+
+    async def extract_query_signature(self, image: Union[str, bytes]) -> ImageSignature:
+        """Signature of an uploaded query image; raises ValueError for undecodable input"""
+        return await self._submit(_query_signature, image)
+
+    async def match_descriptors(self, query: bytes, candidates: Sequence[Optional[bytes]]) -> List[float]:
+        """Descriptor match scores in [0, 1] of candidate items against a query image"""
+        return await self._submit(_match_descriptors, query, list(candidates))
+
+    async def render_renditions(self, data: bytes, sizes: Sequence[int], image_format: str = "JPEG") -> Dict[int, bytes]:
+        """Encoded thumbnail renditions of an image, keyed by maximum dimension"""
+        return await self._submit(_render_renditions, data, tuple(sizes), image_format)
+
+    async def image_hash(self, data: bytes) -> Optional[int]:
+        """Perceptual hash of an encoded image, or None if it cannot be decoded"""
+        return (await self._submit(_hash_batch, [data]))[0]
+
+    async def _map_batches(self, func, items: Sequence) -> list:
+        batches = [items[start:start + self.batch_size] for start in range(0, len(items), self.batch_size)]
+        results = await asyncio.gather(*(self._submit(func, batch) for batch in batches))
+        return [result for batch in results for result in batch]
+
+    async def extract_many(self, images: Sequence[Optional[str]]) -> List[Optional[List[float]]]:
+        """Feature vectors for many images, submitted to the workers in batches"""
+        return await self._map_batches(_extract_batch, images)
+
+    async def hash_many(self, images: Sequence[bytes]) -> List[Optional[int]]:
+        """Perceptual hashes for many encoded images, submitted to the workers in batches"""
+        return await self._map_batches(_hash_batch, images)
@@ -0,0 +1,276 @@
+import asyncio
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from pymongo import ReturnDocument
+
+JOB_PROJECTION = {"_id": 0}
+
+
+class JobQueue:
+    """In-process async job queue backed by durable job records in MongoDB
+
+    Job ids flow through a bounded asyncio queue to a fixed number of workers. Each job
+    is recorded in the jobs collection before it is queued, and a worker claims it by
+    atomically moving it from queued to running under a lease, so a job runs at most once
+    at a time. Failures are retried with exponential backoff and jitter up to max_attempts.
+    Several server processes can share a jobs collection: a worker renews the lease of the
+    job it is running, and a job whose lease expires (its process died) is queued again by
+    whichever process notices first. Queueing never waits: a job that does not fit in the
+    queue, or whose process died before queueing it, stays recorded as queued and is picked
+    up by the periodic sweep of stale queued jobs (and on start), so handlers must be
+    idempotent.
+    """
+
+    def __init__(self, collection, workers: int = 4, max_queued: int = 1000, max_attempts: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 300.0, lease_seconds: float = 60.0):
+        self.collection = collection
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        # Identifies this process's claims in the jobs collection
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, Callable[..., Awaitable[Any]]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def register(self, kind: str, handler: Callable[..., Awaitable[Any]]):
+        """Handle jobs of a kind; the handler is called with the job payload as keyword arguments"""
+        self._handlers[kind] = handler
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(self.max_queued)
+        for _ in range(self.workers):
+            self._spawn(self._worker())
+
+        # Jobs whose process died mid-run are retried from the start; siblings' running jobs keep their leases
+        await self.recover_expired()
+        cursor = self.collection.find({"status": "queued"}, {"_id": 0, "id": 1, "runAt": 1}).sort("runAt", 1)
+        async for job in cursor:
+            self._schedule(job["id"], job.get("runAt"))
+        self._spawn(self._recover_periodically())
+
+    async def recover_expired(self) -> int:
+        """Queue running jobs whose lease has expired (or that predate leases) again; returns how many"""
+        now = datetime.utcnow()
+        expired = {"status": "running", "$or": [{"leaseExpiresAt": {"$lt": now}}, {"leaseExpiresAt": None}]}
+        count = 0
+        async for job in self.collection.find(expired, {"_id": 0, "id": 1}):
+            # Requeued one at a time so each job is recovered by exactly one process
+            requeued = await self.collection.find_one_and_update(
+                {"id": job["id"], **expired},
+                {"$set": {"status": "queued", "runAt": now, "updatedAt": now, "leaseOwner": None, "leaseExpiresAt": None}}
+            )
+            if requeued is not None:
+                self._schedule(job["id"])
+                count += 1
+        return count
+
+    async def recover_stale(self) -> int:
+        """Queue jobs waiting more than a lease period past their run time while there is room; returns how many
+
+        These were never queued (the queue was full, or their process died first) or were
+        lost with the process that queued them.
+        """
+        room = self.max_queued - self._queue.qsize()
+        if room <= 0:
+            return 0
+        now = datetime.utcnow()
+        stale = {"status": "queued", "runAt": {"$lt": now - timedelta(seconds=self.lease_seconds)}}
+        count = 0
+        cursor = self.collection.find(stale, {"_id": 0, "id": 1}).sort("runAt", 1).limit(room)
+        async for job in cursor:
+            # Moving runAt up takes the job off the other processes' sweeps for a lease period
+            taken = await self.collection.find_one_and_update({"id": job["id"], **stale}, {"$set": {"runAt": now}})
+            if taken is not None:
+                if not self._offer(job["id"]):
+                    break
+                count += 1
+        return count
+
+    async def _recover_periodically(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                count = await self.recover_expired()
+                if count:
+                    print(f"Requeued {count} jobs whose worker lease expired")
+                count = await self.recover_stale()
+                if count:
+                    print(f"Queued {count} stale jobs")
+            except Exception as e:
+                print(f"Job lease recovery error: {e}")
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._queue = None
+
+    def _new_record(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+        now = datetime.utcnow()
+        return {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "error": None,
+            "leaseOwner": None,
+            "leaseExpiresAt": None,
+            "runAt": now,
+            "createdAt": now,
+            "updatedAt": now,
+            "finishedAt": None
+        }
+
+    async def enqueue(self, kind: str, **payload) -> str:
+        """Record a job and queue it without waiting; returns the job id"""
+        return (await self.enqueue_many(kind, [payload]))[0]
+
+    async def enqueue_many(self, kind: str, payloads: List[Dict[str, Any]]) -> List[str]:
+        job_ids = await self.create_many(kind, payloads)
+        self.release(job_ids)
+        return job_ids
+
+    async def create(self, kind: str, **payload) -> str:
+        return (await self.create_many(kind, [payload]))[0]
+
+    async def create_many(self, kind: str, payloads: List[Dict[str, Any]]) -> List[str]:
+        """Record jobs without queueing them; release them once whatever they act on has been written
+
+        Recording first means a crash in between leaves a durable job (picked up by the stale
+        sweep) rather than data nothing will ever process.
+        """
+        records = [self._new_record(kind, payload) for payload in payloads]
+        if not records:
+            return []
+        await self.collection.insert_many(records)
+        return [record["id"] for record in records]
+
+    def release(self, job_ids: List[str]):
+        """Queue recorded jobs without waiting; ones that do not fit are left to the stale sweep"""
+        for position, job_id in enumerate(job_ids):
+            if not self._offer(job_id):
+                print(f"Job queue full; {len(job_ids) - position} jobs wait for the stale job sweep")
+                return
+
+    async def discard(self, job_ids: List[str]):
+        """Delete recorded jobs that were never released, e.g. when their item failed to insert"""
+        if job_ids:
+            await self.collection.delete_many({"id": {"$in": job_ids}, "status": "queued"})
+
+    def _offer(self, job_id: str) -> bool:
+        try:
+            self._queue.put_nowait(job_id)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _schedule(self, job_id: str, run_at: Optional[datetime] = None):
+        delay = (run_at - datetime.utcnow()).total_seconds() if run_at else 0
+
+        async def put():
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._queue.put(job_id)
+
+        self._spawn(put())
+
+    def retry_delay(self, attempts: int) -> float:
+        """Exponential backoff with full jitter, so retries of a failing dependency spread out"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempts - 1)))
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job queue error for job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _renew_lease(self, job_id: str):
+        """Keep extending the lease on a running job until cancelled"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.collection.update_one(
+                    {"id": job_id, "status": "running", "leaseOwner": self.owner},
+                    {"$set": {"leaseExpiresAt": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+                )
+            except Exception as e:
+                print(f"Job lease renewal error for job {job_id}: {e}")
+
+    async def _finish(self, job_id: str, update: Dict[str, Any]) -> bool:
+        """Record a job's outcome and release its lease, unless another process has taken the job over"""
+        result = await self.collection.update_one(
+            {"id": job_id, "status": "running", "leaseOwner": self.owner},
+            {"$set": {**update, "leaseOwner": None, "leaseExpiresAt": None, "updatedAt": datetime.utcnow()}}
+        )
+        if result.modified_count == 0:
+            print(f"Job {job_id} lease was lost before it finished; its outcome is left to the new owner")
+            return False
+        return True
+
+    async def _run(self, job_id: str):
+        now = datetime.utcnow()
+        job = await self.collection.find_one_and_update(
+            {"id": job_id, "status": "queued"},
+            {
+                "$set": {
+                    "status": "running", "updatedAt": now,
+                    "leaseOwner": self.owner, "leaseExpiresAt": now + timedelta(seconds=self.lease_seconds)
+                },
+                "$inc": {"attempts": 1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        # Already claimed, finished or removed
+        if job is None:
+            return
+
+        renewal = asyncio.create_task(self._renew_lease(job_id))
+        try:
+            await self._handlers[job["kind"]](**job["payload"])
+        except Exception as e:
+            now = datetime.utcnow()
+            if job["attempts"] >= self.max_attempts:
+                if await self._finish(job_id, {"status": "failed", "error": str(e), "finishedAt": now}):
+                    print(f"Job {job_id} ({job['kind']}) failed after {job['attempts']} attempts: {e}")
+                return
+            run_at = now + timedelta(seconds=self.retry_delay(job["attempts"]))
+            if await self._finish(job_id, {"status": "queued", "error": str(e), "runAt": run_at}):
+                self._schedule(job_id, run_at)
+            return
+        finally:
+            renewal.cancel()
+
+        await self._finish(job_id, {"status": "done", "error": None, "finishedAt": datetime.utcnow()})
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"id": job_id}, JOB_PROJECTION)
+
+    async def join(self):
+        """Wait until every queued job has been processed (retries scheduled for later excepted)"""
+        await self._queue.join()
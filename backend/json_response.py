@@ -0,0 +1,32 @@
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def default(obj: Any) -> Any:
+    """Encode the BSON types Motor returns that orjson has no native support for
+
+    datetime, dicts, lists and NumPy scalars and arrays are handled natively by orjson.
+    """
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize raw Motor documents to JSON in a single pass"""
+    return orjson.dumps(content, default=default, option=OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by orjson
+
+    Endpoints return it directly so FastAPI skips its jsonable_encoder walk as well.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,84 @@
+from datetime import date
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from search_index import tokenize
+
+# Relative weight of each signal; signals missing on either side are left out and the rest renormalised
+MATCH_WEIGHTS = {"category": 0.2, "text": 0.3, "location": 0.15, "date": 0.1, "image": 0.25}
+
+# Words common to most reports that say nothing about the item itself
+STOP_WORDS = {
+    "a", "an", "and", "at", "by", "for", "found", "from", "i", "in", "is", "it", "lost",
+    "my", "near", "of", "on", "or", "the", "to", "was", "with"
+}
+
+
+def terms(item: Mapping[str, Any], fields: Sequence[str]) -> Set[str]:
+    return {term for field in fields for term in tokenize(item.get(field)) if term not in STOP_WORDS}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> Optional[float]:
+    if not a or not b:
+        return None
+    return len(a & b) / len(a | b)
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    try:
+        return date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def date_score(lost_date: Optional[str], found_date: Optional[str], window_days: int = 30) -> Optional[float]:
+    """1.0 for the same day, falling linearly to 0 at window_days apart"""
+    lost_on, found_on = parse_date(lost_date), parse_date(found_date)
+    if lost_on is None or found_on is None:
+        return None
+    days = (found_on - lost_on).days
+    # An item cannot be found well before it was lost; a day of slack covers time zones and guesses
+    if days < -1:
+        return 0.0
+    return max(0.0, 1.0 - abs(days) / window_days)
+
+
+def image_score(a: Optional[Sequence[float]], b: Optional[Sequence[float]]) -> Optional[float]:
+    if not a or not b:
+        return None
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    if norm == 0.0:
+        return None
+    return max(0.0, float(a @ b) / norm)
+
+
+def score_pair(lost: Mapping[str, Any], found: Mapping[str, Any],
+               weights: Mapping[str, float] = MATCH_WEIGHTS) -> Tuple[float, Dict[str, float]]:
+    """Overall match score in [0, 1] for a lost and a found item, with the per-signal scores behind it"""
+    signals = {
+        "category": float(lost.get("category") == found.get("category")) if lost.get("category") and found.get("category") else None,
+        "text": jaccard(terms(lost, ("title", "description")), terms(found, ("title", "description"))),
+        "location": jaccard(terms(lost, ("location", "specificLocation")), terms(found, ("location", "specificLocation"))),
+        "date": date_score(lost.get("date"), found.get("date")),
+        "image": image_score(lost.get("imageFeatures"), found.get("imageFeatures")),
+    }
+    signals = {name: round(value, 4) for name, value in signals.items() if value is not None}
+    total_weight = sum(weights[name] for name in signals)
+    if not total_weight:
+        return 0.0, signals
+    return sum(weights[name] * value for name, value in signals.items()) / total_weight, signals
+
+
+def rank_candidates(item: Mapping[str, Any], item_type: str, candidates: Sequence[Mapping[str, Any]],
+                    k: int = 10, min_score: float = 0.35) -> List[Tuple[Mapping[str, Any], float, Dict[str, float]]]:
+    """Score an item against candidates of the opposite type, keeping the best k above min_score"""
+    ranked = []
+    for candidate in candidates:
+        lost, found = (item, candidate) if item_type == "lost" else (candidate, item)
+        score, signals = score_pair(lost, found)
+        if score >= min_score:
+            ranked.append((candidate, score, signals))
+    ranked.sort(key=lambda match: match[1], reverse=True)
+    return ranked[:k]
@@ -0,0 +1,116 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+
+class ResponseCache:
+    """LRU cache of pre-serialized response bodies with a TTL and a byte budget
+
+    Each entry remembers the generation of every collection it was built from.
+    Writers bump a collection's generation, which makes all entries built from it
+    stale at once without scanning the cache; stale entries are dropped when next read.
+    Under several workers the generations come from SharedGenerations through observe().
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float = 30.0, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        # key -> (expiry time, collection generations, body), least recently used first
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, int], bytes]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_bytes > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def generations(self, collections: Iterable[str]) -> Dict[str, int]:
+        """Current generation of each collection, captured before building a response"""
+        return {collection: self._generations.get(collection, 0) for collection in collections}
+
+    def bump(self, collection: str):
+        """Invalidate every entry built from a collection"""
+        self._generations[collection] = self._generations.get(collection, 0) + 1
+
+    def observe(self, generations: Dict[str, int]):
+        """Adopt generations read from the shared store, invalidating entries built before another worker's write"""
+        self._generations.update(generations)
+
+    def _evict(self, key: Hashable):
+        _, _, body = self._entries.pop(key)
+        self.size -= len(body)
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires, generations, body = entry
+        if expires <= self._clock() or any(self._generations.get(collection, 0) != generation
+                                            for collection, generation in generations.items()):
+            self._evict(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: Hashable, generations: Dict[str, int], body: bytes):
+        """Store a body built from the given collection generations, evicting least recently used entries"""
+        if not self.enabled or len(body) > self.max_bytes:
+            return
+        # A writer bumped a generation while the response was being built
+        if generations != self.generations(generations):
+            return
+
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = (self._clock() + self.ttl, generations, body)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+
+class SharedGenerations:
+    """Collection generations kept in Mongo, so a write handled by any worker invalidates every worker's cache
+
+    Reading them is one lookup by _id on a collection with one tiny document per item collection.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def read(self, collections: Iterable[str]) -> Dict[str, int]:
+        collections = list(collections)
+        found = {
+            document["_id"]: document["generation"]
+            async for document in self.collection.find({"_id": {"$in": collections}})
+        }
+        return {collection: found.get(collection, 0) for collection in collections}
+
+    async def bump(self, collection: str) -> int:
+        """Invalidate a collection for every worker and return its new generation"""
+        document = await self.collection.find_one_and_update(
+            {"_id": collection},
+            {"$inc": {"generation": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return document["generation"]
@@ -0,0 +1,182 @@
+import math
+import re
+from array import array
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Field weights mirror the Mongo text index so both search modes rank alike
+DEFAULT_FIELD_WEIGHTS = {"title": 10.0, "location": 5.0, "specificLocation": 5.0, "description": 2.0}
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def trigrams(term: str) -> Set[str]:
+    """Character trigrams of a term, padded so short terms and word edges still match"""
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Damerau-Levenshtein (optimal string alignment) distance, stopping early once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            # Adjacent transpositions ("iphnoe" -> "iphone") count as one edit
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def allowed_edits(term: str) -> int:
+    if len(term) < 4:
+        return 0
+    if len(term) < 8:
+        return 1
+    return 2
+
+
+class SearchIndex:
+    """Incremental inverted index with BM25 ranking and trigram-based typo tolerance
+
+    Documents get increasing ordinals, so every postings list stays sorted as it is
+    appended to. Postings are compact typed arrays (doc ordinals and field-weighted
+    term frequencies) that NumPy scores without copying. Removed documents are
+    tombstoned until the next rebuild.
+    """
+
+    def __init__(self, field_weights: Optional[Mapping[str, float]] = None,
+                 k1: float = 1.2, b: float = 0.75, fuzzy_penalty: float = 0.7):
+        self.field_weights = dict(field_weights or DEFAULT_FIELD_WEIGHTS)
+        self.k1 = k1
+        self.b = b
+        self.fuzzy_penalty = fuzzy_penalty
+        self.clear()
+
+    def clear(self):
+        self._ids: List[Optional[str]] = []
+        self._ordinals: Dict[str, int] = {}
+        self._lengths = array('f')
+        self._alive = array('B')
+        self._total_length = 0.0
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        # trigram -> indexed terms containing it, for fuzzy candidate lookup
+        self._terms_by_trigram: Dict[str, Set[str]] = {}
+        self._live = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._ordinals
+
+    def add(self, item_id: str, document: Mapping[str, Optional[str]]):
+        """Index a document's weighted fields, replacing any earlier version of it"""
+        self.remove(item_id)
+
+        frequencies: Dict[str, float] = {}
+        length = 0.0
+        for field, weight in self.field_weights.items():
+            for term in tokenize(document.get(field)):
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+                length += weight
+
+        ordinal = len(self._ids)
+        self._ids.append(item_id)
+        self._ordinals[item_id] = ordinal
+        self._lengths.append(length)
+        self._alive.append(1)
+        self._total_length += length
+        self._live += 1
+
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('I'), array('f'))
+                for gram in trigrams(term):
+                    self._terms_by_trigram.setdefault(gram, set()).add(term)
+            postings[0].append(ordinal)
+            postings[1].append(frequency)
+
+    def remove(self, item_id: str) -> bool:
+        ordinal = self._ordinals.pop(item_id, None)
+        if ordinal is None:
+            return False
+        self._ids[ordinal] = None
+        self._alive[ordinal] = 0
+        self._total_length -= self._lengths[ordinal]
+        self._live -= 1
+        return True
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """Indexed terms matching a query term: itself, or close misspellings at a penalty"""
+        if term in self._postings:
+            return [(term, 1.0)]
+
+        limit = allowed_edits(term)
+        if limit == 0:
+            return []
+
+        # Candidates must share enough trigrams to be within the allowed edits; one edit
+        # (a transposition in particular) can break up to four of a term's trigrams
+        counts: Dict[str, int] = {}
+        grams = trigrams(term)
+        for gram in grams:
+            for candidate in self._terms_by_trigram.get(gram, ()):
+                counts[candidate] = counts.get(candidate, 0) + 1
+        required = max(1, len(grams) - 4 * limit)
+
+        matches = []
+        for candidate, shared in counts.items():
+            if shared < required:
+                continue
+            distance = edit_distance(term, candidate, limit)
+            if distance <= limit:
+                matches.append((candidate, self.fuzzy_penalty ** distance))
+        return matches
+
+    def search(self, query: str, k: int = 50) -> List[Tuple[str, float]]:
+        """Return up to k (item_id, BM25 score) pairs, best first"""
+        terms = tokenize(query)
+        if not terms or not self._live:
+            return []
+
+        size = len(self._ids)
+        lengths = np.frombuffer(self._lengths, dtype=np.float32, count=size)
+        average_length = max(self._total_length / self._live, 1e-9)
+        alive = np.frombuffer(self._alive, dtype=np.uint8, count=size)
+        scores = np.zeros(size, dtype=np.float32)
+
+        for term in terms:
+            for matched, boost in self._expand(term):
+                ordinals, frequencies = self._postings[matched]
+                ordinals = np.frombuffer(ordinals, dtype=np.uint32)
+                frequencies = np.frombuffer(frequencies, dtype=np.float32)
+                # Tombstoned postings do not count towards document frequency
+                documents = int(alive[ordinals].sum())
+                idf = math.log(1 + (self._live - documents + 0.5) / (documents + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[ordinals] / average_length)
+                scores[ordinals] += boost * idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+        # Tombstoned documents keep their postings until a rebuild but never rank
+        scores *= alive
+        candidates = np.flatnonzero(scores > 0)
+        if candidates.size > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self._ids[ordinal], float(scores[ordinal])) for ordinal in candidates]
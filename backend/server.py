@@ -3,28 +3,79 @@ import json
 import uuid
 import base64
 import asyncio
-import cv2
+import heapq
+import hmac
+import zlib
+import time
+from itertools import islice
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
-from io import BytesIO
-from PIL import Image
-from sklearn.metrics.pairwise import cosine_similarity
 
-from fastapi import FastAPI, HTTPException, Query, Body
+from fastapi import FastAPI, HTTPException, Query, Body, Header
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from bson import ObjectId
 
+from blob_store import blob_id_for, create_blob_store, rendition_id
+from db_indexes import ensure_indexes
+from feature_cache import FeatureCache
+from feature_index import create_feature_index, search_indexes
+from image_engine import HISTOGRAM_DIM, ImageSignature, decode_image_data
+from image_hash import create_hash_index, format_hash, is_informative, parse_hash
+from image_pool import ImagePool
+from job_queue import JobQueue
+from json_response import FastJSONResponse, dumps
+from matching import rank_candidates
+from response_cache import ResponseCache, SharedGenerations
+from search_index import SearchIndex, tokenize
+
 # Configuration
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017/umt_belongings_hub')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
+VISUAL_SEARCH_INDEX = os.environ.get('VISUAL_SEARCH_INDEX', 'exact')  # 'exact' or 'ivf'
+IVF_NPROBE = int(os.environ.get('IVF_NPROBE', '8'))
+FEATURE_INDEX_DIR = os.environ.get('FEATURE_INDEX_DIR', '')  # e.g. /dev/shm/umt-feature-index: one exact feature and hash index per host shared by all workers
+VISUAL_SEARCH_MODE = os.environ.get('VISUAL_SEARCH_MODE', 'vector')  # 'vector', 'descriptors' (ORB re-ranking) or 'cascade'
+DESCRIPTOR_RERANK_CANDIDATES = int(os.environ.get('DESCRIPTOR_RERANK_CANDIDATES', '100'))
+CASCADE_HISTOGRAM_CANDIDATES = int(os.environ.get('CASCADE_HISTOGRAM_CANDIDATES', '300'))  # passed on to ORB re-ranking
+CASCADE_HISTOGRAM_THRESHOLD = float(os.environ.get('CASCADE_HISTOGRAM_THRESHOLD', '0.3'))  # minimum colour similarity
+IMAGE_POOL_WORKERS = int(os.environ.get('IMAGE_POOL_WORKERS', '0')) or None  # defaults to available cores
+IMAGE_POOL_QUEUE_DEPTH = int(os.environ.get('IMAGE_POOL_QUEUE_DEPTH', '0')) or None  # defaults to 2 x workers
+IMAGE_POOL_BATCH_SIZE = int(os.environ.get('IMAGE_POOL_BATCH_SIZE', '16'))
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', '50000000'))  # larger uploads are rejected before decoding
+FUZZY_SEARCH = os.environ.get('FUZZY_SEARCH', 'false').lower() in ('1', 'true', 'yes')  # in-process typo-tolerant search
+FUZZY_SEARCH_CANDIDATES = int(os.environ.get('FUZZY_SEARCH_CANDIDATES', '1000'))
+FUZZY_SEARCH_REFRESH = float(os.environ.get('FUZZY_SEARCH_REFRESH', '30'))  # seconds until items other workers insert become fuzzy-searchable; 0 for a single worker
+IMAGE_STORE = os.environ.get('IMAGE_STORE', 'gridfs')  # 'gridfs' or 'local'
+THUMBNAIL_SIZES = [int(size) for size in os.environ.get('THUMBNAIL_SIZES', '64,256,768').split(',')]
+THUMBNAIL_FORMAT = os.environ.get('THUMBNAIL_FORMAT', 'JPEG')  # 'JPEG' or 'WEBP'
+LIST_THUMBNAIL_SIZE = int(os.environ.get('LIST_THUMBNAIL_SIZE', '256'))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', '30'))  # seconds; 0 disables the listing cache
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+QUERY_FEATURE_CACHE_MAX_BYTES = int(os.environ.get('QUERY_FEATURE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # 0 disables
+EXPORT_TOKEN = os.environ.get('EXPORT_TOKEN', '')  # required in X-Export-Token; exports are disabled when unset
+DUPLICATE_HASH_DISTANCE = int(os.environ.get('DUPLICATE_HASH_DISTANCE', '6'))  # max differing dHash bits for a near-duplicate image
+MATCH_CANDIDATES = int(os.environ.get('MATCH_CANDIDATES', '200'))  # per candidate source (category, image features)
+MATCH_MIN_SCORE = float(os.environ.get('MATCH_MIN_SCORE', '0.35'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))  # concurrent background jobs (thumbnails, hashes, features, matching)
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '5'))
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', '60'))  # a running job whose worker stops renewing this long is retried
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', '500'))
+QUICK_SEARCH_UNION = os.environ.get('QUICK_SEARCH_UNION', 'false').lower() in ('1', 'true', 'yes')  # one $unionWith round trip (MongoDB 4.4+)
+IMAGE_STORE_PATH = os.environ.get('IMAGE_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'image_store'))
+
+# Listings link thumbnails at LIST_THUMBNAIL_SIZE and get_image only serves THUMBNAIL_SIZES, so they must agree
+if LIST_THUMBNAIL_SIZE not in THUMBNAIL_SIZES:
+    raise ValueError(f"LIST_THUMBNAIL_SIZE {LIST_THUMBNAIL_SIZE} must be one of THUMBNAIL_SIZES {THUMBNAIL_SIZES}")
 
 # Initialize FastAPI app
-app = FastAPI(title="UMT Belongings Hub API", version="1.0.0")
+app = FastAPI(title="UMT Belongings Hub API", version="1.0.0", default_response_class=FastJSONResponse)
 
 # Add CORS middleware manually to avoid issues
 @app.middleware("http")
@@ -43,16 +94,31 @@ except Exception as e:
     print(f"MongoDB connection error: {e}")
     db = None
 
+# Item images live outside the item documents; items keep only the image id
+try:
+    image_store = create_blob_store(IMAGE_STORE, db=db, root=IMAGE_STORE_PATH)
+except Exception as e:
+    print(f"Image store error: {e}")
+    image_store = None
+
 # Pydantic models
 class QuickSearchRequest(BaseModel):
     searchType: str = "both"  # 'lost', 'found', or 'both' 
     itemCategory: Optional[str] = None
     location: Optional[str] = None
     date: Optional[str] = None
+    mode: str = "text"  # 'text' (indexed full-text) or 'regex'
+    fields: Optional[str] = None  # comma separated item fields, or 'all'
 
 class VisualSearchRequest(BaseModel):
     imageBase64: str
     searchType: str = "both"  # 'lost', 'found', or 'both'
+    nprobe: Optional[int] = None  # IVF lists to scan; higher improves recall at the cost of latency
+    mode: Optional[str] = None  # 'vector', 'descriptors' or 'cascade'; defaults to VISUAL_SEARCH_MODE
+    category: Optional[str] = None  # cascade mode metadata filters
+    dateFrom: Optional[str] = None  # YYYY-MM-DD, inclusive
+    dateTo: Optional[str] = None
+    fields: Optional[str] = None  # comma separated item fields, or 'all'
 
 class LostItemCreate(BaseModel):
     title: str
@@ -78,93 +144,1003 @@ class FoundItemCreate(BaseModel):
     finderInfo: Dict[str, Any]
     additionalNotes: Optional[str] = None
 
-# Image Processing Utilities
-class ImageSimilarityEngine:
-    def __init__(self):
-        # Initialize ORB detector for feature extraction
-        self.orb = cv2.ORB_create(nfeatures=500)
+ITEM_MODELS = {"lost": LostItemCreate, "found": FoundItemCreate}
+
+# Decoding and feature extraction run in worker processes so they never block the event loop
+image_pool = ImagePool(
+    workers=IMAGE_POOL_WORKERS,
+    queue_depth=IMAGE_POOL_QUEUE_DEPTH,
+    batch_size=IMAGE_POOL_BATCH_SIZE,
+    max_pixels=IMAGE_MAX_PIXELS
+)
+
+# Post-insert image processing and matching run as durable background jobs
+job_queue = JobQueue(db.jobs, workers=JOB_WORKERS, max_attempts=JOB_MAX_ATTEMPTS, lease_seconds=JOB_LEASE_SECONDS) if db is not None else None
+
+# Visual search settings
+VISUAL_SEARCH_LIMIT = 15
+QUICK_SEARCH_LIMIT = 20
+VISUAL_SEARCH_THRESHOLD = 20  # minimum similarity percentage
+VISUAL_SEARCH_MODES = ["vector", "descriptors", "cascade"]
+DESCRIPTOR_MIN_SCORE = 0.1  # descriptor mode scores are the fraction of ratio-tested ORB matches, not cosine
+
+# Resident feature indexes, one per item type, warmed at startup and updated on insert
+# With FEATURE_INDEX_DIR they live in memory-mapped files that every worker process maps
+feature_indexes = {
+    item_type: create_feature_index(VISUAL_SEARCH_INDEX, directory=FEATURE_INDEX_DIR, name=f"features-{item_type}", nprobe=IVF_NPROBE)
+    for item_type in ("lost", "found")
+}
+feature_indexes_ready = False
+PROCESS_STARTED = time.time()
+
+# Colour histograms behind the cascade's cheap prefilter stage, warmed alongside the feature indexes
+histogram_indexes = {
+    item_type: create_feature_index("exact", HISTOGRAM_DIM, directory=FEATURE_INDEX_DIR, name=f"histograms-{item_type}")
+    for item_type in ("lost", "found")
+}
+
+# Stored feature vectors, descriptors, histograms and location terms are only used for scoring and
+# filtering, never returned to clients
+ITEM_PROJECTION = {"imageFeatures": 0, "imageDescriptors": 0, "imageHistogram": 0, "locationTerms": 0}
+
+# Fields clients may request with fields=, and the lightweight set listings return by default
+ITEM_FIELDS = {
+    "_id", "id", "type", "title", "category", "description", "location", "specificLocation",
+    "date", "image", "imageId", "imageHash", "thumbnail", "imageRenditions", "duplicateOf",
+    "status", "ownerInfo", "finderInfo", "offerReward", "rewardAmount", "additionalNotes",
+    "createdAt", "updatedAt"
+}
+LISTING_FIELDS = [
+    "id", "type", "title", "category", "description", "location", "specificLocation",
+    "date", "image", "thumbnail", "duplicateOf", "status", "offerReward", "rewardAmount", "createdAt"
+]
+
+# Text mode uses the weighted text index (see db_indexes); regex scans remain as an opt-in fallback
+SEARCH_MODES = ["text", "regex", "fuzzy"]
+SEARCH_INDEX_PROJECTION = {"_id": 0, "id": 1, "title": 1, "description": 1, "location": 1, "specificLocation": 1}
+
+# Perceptual hashes of item images, one multi-index hash table per item type, for near-duplicate reports
+# With FEATURE_INDEX_DIR they are shared like the feature indexes, so repeats handled by different workers still link
+duplicate_indexes = {
+    item_type: create_hash_index(FEATURE_INDEX_DIR, f"hashes-{item_type}")
+    for item_type in ("lost", "found")
+}
+HASH_PROJECTION = {"_id": 0, "id": 1, "imageHash": 1}
+
+# Lost/found pairing: each new item is scored against candidates of the opposite type
+MATCH_LIMIT = 10
+MATCH_PROJECTION = {
+    "_id": 0, "id": 1, "title": 1, "description": 1, "category": 1,
+    "location": 1, "specificLocation": 1, "date": 1, "imageFeatures": 1
+}
+OPPOSITE_TYPE = {"lost": "found", "found": "lost"}
+
+# Optional in-process inverted indexes behind mode=fuzzy, rebuilt at startup and updated on insert
+# Every worker keeps its own, catching up on items its siblings inserted every FUZZY_SEARCH_REFRESH seconds
+search_engines = {"lost": SearchIndex(), "found": SearchIndex()}
+search_engines_ready = False
+
+# Serialized listing and quick search responses, invalidated per collection when items are reported
+# The generations live in Mongo, so a report handled by one worker invalidates every worker's entries
+response_cache = ResponseCache(max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=RESPONSE_CACHE_TTL)
+cache_generations = SharedGenerations(db.cache_generations) if db is not None else None
+
+# Signatures of uploaded query images by content hash, so repeated and retried searches skip extraction
+query_feature_cache = FeatureCache(max_bytes=QUERY_FEATURE_CACHE_MAX_BYTES)
+SIGNATURE_PROJECTION = {"_id": 0, "imageFeatures": 1, "imageDescriptors": 1, "imageHistogram": 1}
+
+def check_search_mode(mode: str):
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {SEARCH_MODES}")
+    if mode == "fuzzy" and not FUZZY_SEARCH:
+        raise HTTPException(status_code=400, detail="Fuzzy search is not enabled on this server")
+
+def item_projection(fields: Optional[str]) -> Dict[str, int]:
+    """Turn a fields= parameter into a Mongo projection pushed down into find()"""
+    if fields is None:
+        names = LISTING_FIELDS
+    elif fields.strip() == "all":
+        return ITEM_PROJECTION
+    else:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = sorted(set(names) - ITEM_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    
+    # id is always returned so clients can link back to the item
+    projection = {name: 1 for name in names}
+    projection["id"] = 1
+    if "_id" not in projection:
+        projection["_id"] = 0
+    return projection
+
+def normalize_fields(fields: Optional[str]) -> Optional[str]:
+    """Canonical form of a fields= parameter, so equivalent requests share a cache entry"""
+    if fields is None:
+        return None
+    if fields.strip() == "all":
+        return "all"
+    return ",".join(sorted({name.strip() for name in fields.split(",") if name.strip()}))
+
+async def cached_response(key, item_types: List[str], load) -> Response:
+    """Serve a JSON body from the response cache, building and caching it with load() on a miss"""
+    if response_cache.enabled and cache_generations is not None:
+        response_cache.observe(await cache_generations.read(item_types))
+    body = response_cache.get(key)
+    status = "HIT"
+    if body is None:
+        # Captured first, so a write landing while load() runs keeps the result out of the cache
+        generations = response_cache.generations(item_types)
+        body = dumps(await load())
+        response_cache.put(key, generations, body)
+        status = "MISS"
+    return Response(content=body, media_type="application/json", headers={"X-Cache": status})
+
+# Listings page newest first; _id breaks ties between items created in the same instant
+PAGE_SORT = [("createdAt", -1), ("_id", -1)]
+
+def encode_cursor(item: Dict[str, Any]) -> str:
+    """Opaque token for the (createdAt, _id) position of the last item on a page"""
+    created_at = item.get("createdAt")
+    payload = {"c": created_at.isoformat() if created_at else None, "i": str(item["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def cursor_predicate(cursor: str) -> Dict[str, Any]:
+    """Range predicate matching the items after a cursor in PAGE_SORT order"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        created_at = datetime.fromisoformat(payload["c"]) if payload["c"] else None
+        last_id = ObjectId(payload["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    def base64_to_image(self, base64_string: str) -> np.ndarray:
-        """Convert base64 string to OpenCV image"""
+    # Items without a createdAt sort last, so past one only other undated items remain
+    if created_at is None:
+        return {"createdAt": None, "_id": {"$lt": last_id}}
+    return {"$or": [
+        {"createdAt": {"$lt": created_at}},
+        {"createdAt": created_at, "_id": {"$lt": last_id}}
+    ]}
+
+def with_sort_keys(projection: Dict[str, Any]):
+    """Extend a projection with the PAGE_SORT keys, returning it and the names to strip from results"""
+    if not any(value == 1 for value in projection.values()):
+        return projection, []
+    hidden = [name for name in ("createdAt", "_id") if projection.get(name) != 1]
+    return {**projection, "createdAt": 1, "_id": 1}, hidden
+
+def strip_fields(items: List[Dict[str, Any]], names: List[str]) -> List[Dict[str, Any]]:
+    for item in items:
+        for name in names:
+            item.pop(name, None)
+    return items
+
+def recency(item: Dict[str, Any]):
+    """Merge key matching the createdAt order of PAGE_SORT"""
+    return item.get("createdAt") or datetime.min
+
+async def fetch_page(collection, query: Dict[str, Any], projection: Dict[str, Any], limit: int,
+                     cursor: Optional[str] = None):
+    """Fetch one page in PAGE_SORT order plus the cursor for the next page, if there is one"""
+    if cursor:
+        predicate = cursor_predicate(cursor)
+        query = {"$and": [query, predicate]} if "$or" in query else {**query, **predicate}
+    
+    # The next cursor needs createdAt and _id even when the client did not ask for them
+    projection, hidden = with_sort_keys(projection)
+    
+    # One extra item tells whether another page exists
+    items = await collection.find(query, projection).sort(PAGE_SORT).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1])
+    return strip_fields(items, hidden), next_cursor
+
+async def fetch_recent_items(item_types: List[str], query: Dict[str, Any], projection: Dict[str, Any],
+                             limit: int) -> List[Dict[str, Any]]:
+    """Newest items matching query across several collections, under one global limit"""
+    projection, hidden = with_sort_keys(projection)
+    
+    if QUICK_SEARCH_UNION and len(item_types) > 1:
+        # Each branch is sorted and limited on its own index, then merged server side in one round trip
+        branch = [{"$match": query}, {"$sort": dict(PAGE_SORT)}, {"$limit": limit}, {"$project": projection}]
+        pipeline = list(branch)
+        for item_type in item_types[1:]:
+            pipeline.append({"$unionWith": {"coll": get_collection(item_type).name, "pipeline": branch}})
+        pipeline += [{"$sort": dict(PAGE_SORT)}, {"$limit": limit}]
+        items = await get_collection(item_types[0]).aggregate(pipeline).to_list(length=limit)
+        return strip_fields(items, hidden)
+    
+    # Collections are queried concurrently, so latency is the slowest query rather than the sum
+    results = await asyncio.gather(*[
+        get_collection(item_type).find(query, projection).sort(PAGE_SORT).limit(limit).to_list(length=limit)
+        for item_type in item_types
+    ])
+    # Each result is already newest first, so a k-way merge yields the global top
+    items = list(islice(heapq.merge(*results, key=recency, reverse=True), limit))
+    return strip_fields(items, hidden)
+
+def search_filter(query: Dict[str, Any], q: Optional[str], category: Optional[str],
+                  location: Optional[str], mode: str) -> Dict[str, Any]:
+    """Add search_items-style text, category and location conditions to a base filter"""
+    query = dict(query)
+    
+    # Text search across multiple fields
+    if q and mode == "text":
+        query["$text"] = {"$search": q}
+    elif q:
+        query["$or"] = [
+            {"title": {"$regex": q, "$options": "i"}},
+            {"description": {"$regex": q, "$options": "i"}},
+            {"location": {"$regex": q, "$options": "i"}},
+            {"specificLocation": {"$regex": q, "$options": "i"}}
+        ]
+    
+    # Category filter; categories come from a fixed list, so an exact match can use the category index
+    if category and mode == "regex":
+        query["category"] = {"$regex": category, "$options": "i"}
+    elif category:
+        query["category"] = category
+    
+    # Location filter
+    if location:
+        if "$or" in query:
+            # If text search exists, combine with location
+            query = {
+                "$and": [
+                    query,
+                    {
+                        "$or": [
+                            {"location": {"$regex": location, "$options": "i"}},
+                            {"specificLocation": {"$regex": location, "$options": "i"}}
+                        ]
+                    }
+                ]
+            }
+        else:
+            query["$or"] = [
+                {"location": {"$regex": location, "$options": "i"}},
+                {"specificLocation": {"$regex": location, "$options": "i"}}
+            ]
+    return query
+
+async def export_chunks(item_types: List[str], query: Dict[str, Any], projection: Dict[str, Any],
+                        compress: bool):
+    """Yield matching items as NDJSON in bounded chunks, optionally gzip compressed"""
+    # wbits=31 writes a gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = bytearray()
+    for item_type in item_types:
+        cursor = get_collection(item_type).find(query, projection, batch_size=EXPORT_BATCH_SIZE)
         try:
-            # Remove data URL prefix if present
-            if base64_string.startswith('data:image'):
-                base64_string = base64_string.split(',')[1]
-            
-            # Decode base64 to bytes
-            image_bytes = base64.b64decode(base64_string)
-            
-            # Convert to PIL Image
-            pil_image = Image.open(BytesIO(image_bytes))
-            
-            # Convert to RGB if needed
-            if pil_image.mode != 'RGB':
-                pil_image = pil_image.convert('RGB')
-            
-            # Convert to OpenCV format (BGR)
-            opencv_image = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-            
-            return opencv_image
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid image format: {str(e)}")
+            async for item in cursor:
+                buffer += dumps(item)
+                buffer += b"\n"
+                if len(buffer) >= EXPORT_CHUNK_BYTES:
+                    chunk = compressor.compress(bytes(buffer)) if compressor else bytes(buffer)
+                    buffer.clear()
+                    if chunk:
+                        yield chunk
+        finally:
+            # Also reached when the client disconnects mid-export
+            await cursor.close()
+    
+    chunk = bytes(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+# Scoring scans read only what they need and stream it in bounded batches
+FEATURE_PROJECTION = {"_id": 0, "id": 1, "imageFeatures": 1}
+DESCRIPTOR_PROJECTION = {"_id": 0, "id": 1, "imageDescriptors": 1}
+INDEX_PROJECTION = {"_id": 0, "id": 1, "imageFeatures": 1, "imageHistogram": 1}
+SCAN_BATCH_SIZE = 500
+
+# Exports stream from the cursor in batches and flush to the client in chunks of roughly this size
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+def get_collection(item_type: str):
+    """Return the collection holding items of the given type"""
+    return db.lost_items if item_type == "lost" else db.found_items
+
+async def backfill_in_chunks(cursor, flush):
+    """Pass the items of a backfill cursor to flush one pool-sized chunk at a time and count them"""
+    # Only one chunk of images is held in memory at a time
+    count = 0
+    chunk = []
+    async for item in cursor:
+        chunk.append(item)
+        if len(chunk) >= image_pool.batch_size * image_pool.workers:
+            await flush(chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+        count += len(chunk)
+    return count
+
+async def backfill_image_features(collection):
+    """Extract and persist features for items reported before they were stored at ingest"""
+    cursor = collection.find(
+        {"image": {"$nin": [None, ""]}, "imageFeatures": {"$exists": False}},
+        {"_id": 1, "image": 1},
+        batch_size=image_pool.batch_size
+    )
+    
+    async def flush(items):
+        all_features = await image_pool.extract_many([item["image"] for item in items])
+        for item, features in zip(items, all_features):
+            # Items whose features cannot be extracted are stored as None so they are not retried
+            await collection.update_one({"_id": item["_id"]}, {"$set": {"imageFeatures": features}})
+    
+    return await backfill_in_chunks(cursor, flush)
+
+def image_url(image_id: str, size: Optional[int] = None) -> str:
+    """URL the frontend loads an item image (or one of its renditions) from"""
+    if size:
+        return f"/api/images/{image_id}?size={size}"
+    return f"/api/images/{image_id}"
+
+async def store_image_renditions(image_id: str, data: bytes) -> List[int]:
+    """Generate and store the thumbnail renditions of an image, returning the sizes created"""
+    try:
+        renditions = await image_pool.render_renditions(data, THUMBNAIL_SIZES, THUMBNAIL_FORMAT)
+    except Exception as e:
+        print(f"Thumbnail generation error for image {image_id}: {e}")
+        return []
+    for size, rendition in renditions.items():
+        await image_store.put(rendition, rendition_id(image_id, size))
+    return sorted(renditions)
+
+async def store_uploaded_image(image: Optional[str]) -> Dict[str, Any]:
+    """Write an uploaded base64 image to the image store; renditions and hashes are added by process_item"""
+    if not image:
+        return {"image": None, "imageId": None, "imageHash": None, "thumbnail": None, "imageRenditions": []}
+    image_id = await image_store.put(decode_image_data(image))
+    return {
+        "image": image_url(image_id),
+        "imageId": image_id,
+        "imageHash": None,
+        # Served from the original until the rendition exists
+        "thumbnail": image_url(image_id, LIST_THUMBNAIL_SIZE),
+        "imageRenditions": []
+    }
+
+async def store_item_image(image: Optional[str]) -> Dict[str, Any]:
+    """Write an uploaded base64 image and its renditions to the image store, returning the item's image fields"""
+    if not image:
+        return {"image": None, "imageId": None, "imageHash": None, "thumbnail": None, "imageRenditions": []}
+    data = decode_image_data(image)
+    image_id = await image_store.put(data)
+    renditions, image_hash = await asyncio.gather(
+        store_image_renditions(image_id, data),
+        image_pool.image_hash(data)
+    )
+    return {
+        "image": image_url(image_id),
+        "imageId": image_id,
+        "imageHash": format_hash(image_hash) if image_hash is not None else None,
+        "thumbnail": image_url(image_id, LIST_THUMBNAIL_SIZE),
+        "imageRenditions": renditions
+    }
+
+def location_terms(*locations: Optional[str]) -> List[str]:
+    """Lower-cased words of an item's location fields, which quick search matches on"""
+    return sorted({term for location in locations for term in tokenize(location)})
+
+def new_item_document(item_type: str, item_data: BaseModel, image_fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the stored document for a newly reported item"""
+    now = datetime.utcnow()
+    return {
+        "id": str(uuid.uuid4()),
+        "type": item_type,
+        **item_data.model_dump(exclude={"image"}),
+        **image_fields,
+        "locationTerms": location_terms(item_data.location, item_data.specificLocation),
+        # Filled in by process_item
+        "imageFeatures": None,
+        "imageDescriptors": None,
+        "imageHistogram": None,
+        "duplicateOf": None,
+        "status": "active",
+        "createdAt": now,
+        "updatedAt": now
+    }
+
+def link_duplicates(item_type: str, item: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Find existing items whose image is a near-duplicate of a new item's, linking it to the closest"""
+    duplicates = []
+    image_hash = parse_hash(item["imageHash"]) if item.get("imageHash") else None
+    if image_hash is not None and is_informative(image_hash):
+        duplicates = [
+            {"id": item_id, "distance": distance}
+            for item_id, distance in duplicate_indexes[item_type].search(image_hash, DUPLICATE_HASH_DISTANCE)
+            if item_id != item["id"]
+        ]
+    item["duplicateOf"] = duplicates[0]["id"] if duplicates else None
+    return duplicates
+
+async def invalidate_responses(item_type: str):
+    """Drop cached responses built from an item collection, in this worker and its siblings"""
+    if cache_generations is None:
+        response_cache.bump(item_type)
+        return
+    response_cache.observe({item_type: await cache_generations.bump(item_type)})
+
+async def index_new_items(item_type: str, items: List[Dict[str, Any]]):
+    """Make inserted items visible to fuzzy search and cached listings; visual indexes follow in process_item"""
+    for item in items:
+        for field in ITEM_PROJECTION:
+            item.pop(field, None)
+        if FUZZY_SEARCH:
+            search_engines[item_type].add(item["id"], item)
+    await invalidate_responses(item_type)
+
+async def process_item(item_type: str, item_id: str):
+    """Background job for a new item: renditions, perceptual hash and visual signature of its image, then duplicate links and matches
+    
+    Every step is idempotent, so a retried or recovered job simply redoes it.
+    """
+    collection = get_collection(item_type)
+    item = await collection.find_one({"id": item_id}, {"_id": 0, "id": 1, "imageId": 1})
+    if item is None:
+        return
+    
+    if item.get("imageId"):
+        data = await image_store.get(item["imageId"])
+        if data is None:
+            raise RuntimeError(f"Image {item['imageId']} is missing from the image store")
+        renditions, image_hash, signature = await asyncio.gather(
+            store_image_renditions(item["imageId"], data),
+            image_pool.image_hash(data),
+            image_pool.signature(data)
+        )
+        update = {
+            "id": item_id,
+            "imageRenditions": renditions,
+            "imageHash": format_hash(image_hash) if image_hash is not None else None,
+            "imageFeatures": signature.features,
+            "imageDescriptors": signature.descriptors,
+            "imageHistogram": signature.histogram
+        }
+        # Linking and indexing happen without an await in between, so concurrent jobs
+        # for repeats of the same photo always see each other
+        link_duplicates(item_type, update)
+        if update["imageHash"]:
+            duplicate_indexes[item_type].add(item_id, parse_hash(update["imageHash"]))
+        if signature.features is not None:
+            feature_indexes[item_type].add(item_id, signature.features)
+        if signature.histogram is not None:
+            histogram_indexes[item_type].add(item_id, signature.histogram)
+        await collection.update_one({"id": item_id}, {"$set": update})
+        await invalidate_responses(item_type)
     
-    def extract_features(self, image: np.ndarray) -> Optional[np.ndarray]:
-        """Extract ORB features from image"""
+    await match_item(item_type, item_id)
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors())
+
+async def backfill_image_renditions(collection):
+    """Generate thumbnails for stored images that predate rendition generation"""
+    cursor = collection.find(
+        {"imageId": {"$nin": [None, ""]}, "imageRenditions": {"$exists": False}},
+        {"_id": 1, "imageId": 1},
+        batch_size=image_pool.batch_size
+    )
+    count = 0
+    async for item in cursor:
+        data = await image_store.get(item["imageId"])
+        sizes = await store_image_renditions(item["imageId"], data) if data else []
+        await collection.update_one({"_id": item["_id"]}, {"$set": {
+            "thumbnail": image_url(item["imageId"], LIST_THUMBNAIL_SIZE),
+            "imageRenditions": sizes
+        }})
+        count += 1
+    return count
+
+async def backfill_location_terms(collection):
+    """Store the location terms quick search matches on for items reported before they were stored"""
+    cursor = collection.find(
+        {"locationTerms": {"$exists": False}},
+        {"_id": 1, "location": 1, "specificLocation": 1},
+        batch_size=SCAN_BATCH_SIZE
+    )
+    count = 0
+    async for item in cursor:
+        terms = location_terms(item.get("location"), item.get("specificLocation"))
+        await collection.update_one({"_id": item["_id"]}, {"$set": {"locationTerms": terms}})
+        count += 1
+    return count
+
+async def migrate_embedded_images(collection):
+    """Move base64 images still embedded in item documents into the image store"""
+    cursor = collection.find(
+        {"image": {"$nin": [None, ""]}, "imageId": {"$exists": False}},
+        {"_id": 1, "image": 1},
+        batch_size=image_pool.batch_size
+    )
+    count = 0
+    async for item in cursor:
         try:
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Resize image to standard size for consistency
-            gray = cv2.resize(gray, (300, 300))
-            
-            # Detect keypoints and compute descriptors
-            keypoints, descriptors = self.orb.detectAndCompute(gray, None)
-            
-            if descriptors is not None:
-                # If we have fewer than 10 descriptors, the image might not be suitable
-                if len(descriptors) < 10:
-                    return None
-                
-                # Flatten descriptors to create a feature vector
-                # Take mean of descriptors to create a fixed-size feature vector
-                feature_vector = np.mean(descriptors, axis=0)
-                return feature_vector
-            
-            return None
-        except Exception as e:
-            print(f"Feature extraction error: {e}")
-            return None
+            update = await store_item_image(item["image"])
+        except ValueError:
+            # Leave undecodable values in place but mark them so they are not retried
+            update = {"imageId": None}
+        await collection.update_one({"_id": item["_id"]}, {"$set": update})
+        count += 1
+    return count
+
+async def backfill_image_hashes(collection):
+    """Compute perceptual hashes for stored images that predate duplicate detection"""
+    cursor = collection.find(
+        {"imageId": {"$nin": [None, ""]}, "imageHash": {"$exists": False}},
+        {"_id": 1, "imageId": 1},
+        batch_size=image_pool.batch_size
+    )
+    
+    async def flush(items):
+        images = [await image_store.get(item["imageId"]) or b"" for item in items]
+        for item, image_hash in zip(items, await image_pool.hash_many(images)):
+            await collection.update_one({"_id": item["_id"]}, {"$set": {
+                "imageHash": format_hash(image_hash) if image_hash is not None else None
+            }})
+    
+    return await backfill_in_chunks(cursor, flush)
+
+async def backfill_image_signatures(collection):
+    """Extract ORB descriptors and colour histograms for stored images that predate them"""
+    cursor = collection.find(
+        {
+            "imageId": {"$nin": [None, ""]},
+            "$or": [{"imageDescriptors": {"$exists": False}}, {"imageHistogram": {"$exists": False}}]
+        },
+        {"_id": 1, "imageId": 1},
+        batch_size=image_pool.batch_size
+    )
     
-    def calculate_similarity(self, features1: np.ndarray, features2: np.ndarray) -> float:
-        """Calculate cosine similarity between two feature vectors"""
+    async def flush(items):
+        images = [await image_store.get(item["imageId"]) or b"" for item in items]
+        for item, signature in zip(items, await image_pool.signature_many(images)):
+            # Stored as None when nothing can be extracted so the item is not retried
+            await collection.update_one({"_id": item["_id"]}, {"$set": {
+                "imageDescriptors": signature.descriptors,
+                "imageHistogram": signature.histogram
+            }})
+    
+    return await backfill_in_chunks(cursor, flush)
+
+async def rebuild_duplicate_index(item_type: str):
+    """Rebuild the perceptual hash index for one item type from stored hashes"""
+    with duplicate_indexes[item_type].rebuilding() as index:
+        cursor = get_collection(item_type).find(
+            {"status": "active", "imageHash": {"$nin": [None, ""]}},
+            HASH_PROJECTION,
+            batch_size=SCAN_BATCH_SIZE
+        )
+        async for item in cursor:
+            index.add(item["id"], parse_hash(item["imageHash"]))
+    return len(duplicate_indexes[item_type])
+
+async def load_duplicate_index(item_type: str):
+    """Warm the perceptual hash index for one item type"""
+    index = duplicate_indexes[item_type]
+    if not FEATURE_INDEX_DIR:
+        return await rebuild_duplicate_index(item_type)
+    
+    # As with the feature indexes, one worker per host rebuilds the shared index
+    async with index.build_lock():
+        if not index.built_after(PROCESS_STARTED):
+            await rebuild_duplicate_index(item_type)
+    return len(index)
+
+async def match_item(item_type: str, item_id: str) -> int:
+    """Score an item against active items of the opposite type and store its best matches"""
+    collection = get_collection(item_type)
+    item = await collection.find_one({"id": item_id}, MATCH_PROJECTION)
+    if item is None:
+        return 0
+    other = get_collection(OPPOSITE_TYPE[item_type])
+    
+    # Candidates come from the category index and the feature index, so the cost
+    # per item stays bounded however large the opposite collection grows
+    queries = []
+    if item.get("category"):
+        queries.append(
+            other.find({"status": "active", "category": item["category"]}, MATCH_PROJECTION)
+            .sort(PAGE_SORT).limit(MATCH_CANDIDATES).to_list(length=MATCH_CANDIDATES)
+        )
+    if item.get("imageFeatures"):
+        similar = feature_indexes[OPPOSITE_TYPE[item_type]].search(
+            item["imageFeatures"], MATCH_CANDIDATES, VISUAL_SEARCH_THRESHOLD / 100
+        )
+        if similar:
+            ids = [similar_id for similar_id, _ in similar]
+            queries.append(other.find({"id": {"$in": ids}, "status": "active"}, MATCH_PROJECTION).to_list(length=len(ids)))
+    candidates = {candidate["id"]: candidate for batch in await asyncio.gather(*queries) for candidate in batch}
+    ranked = rank_candidates(item, item_type, list(candidates.values()), MATCH_LIMIT, MATCH_MIN_SCORE)
+    
+    # Pairs are stored once, so the new item also shows up in each candidate's matches
+    now = datetime.utcnow()
+    operations = []
+    for candidate, score, signals in ranked:
+        lost_id, found_id = (item_id, candidate["id"]) if item_type == "lost" else (candidate["id"], item_id)
+        operations.append(UpdateOne(
+            {"lostId": lost_id, "foundId": found_id},
+            {"$set": {"score": score, "signals": signals, "updatedAt": now}, "$setOnInsert": {"createdAt": now}},
+            upsert=True
+        ))
+    if operations:
+        await db.matches.bulk_write(operations, ordered=False)
+    await collection.update_one({"id": item_id}, {"$set": {"matchedAt": now}})
+    return len(ranked)
+
+async def backfill_matches(item_type: str):
+    """Match active items reported before automatic matching existed"""
+    cursor = get_collection(item_type).find(
+        {"status": "active", "matchedAt": {"$exists": False}},
+        {"_id": 0, "id": 1},
+        batch_size=SCAN_BATCH_SIZE
+    )
+    count = 0
+    async for item in cursor:
+        await match_item(item_type, item["id"])
+        count += 1
+    return count
+
+async def rebuild_feature_index(item_type: str):
+    """Rebuild the feature and colour histogram indexes for one item type from stored vectors"""
+    with feature_indexes[item_type].rebuilding() as index, histogram_indexes[item_type].rebuilding() as histograms:
+        cursor = get_collection(item_type).find(
+            {"status": "active", "$or": [{"imageFeatures": {"$ne": None}}, {"imageHistogram": {"$ne": None}}]},
+            INDEX_PROJECTION,
+            batch_size=SCAN_BATCH_SIZE
+        )
+        async for item in cursor:
+            if item.get("imageFeatures"):
+                index.add(item["id"], item["imageFeatures"])
+            if item.get("imageHistogram"):
+                histograms.add(item["id"], item["imageHistogram"])
+    return len(feature_indexes[item_type])
+
+async def load_feature_index(item_type: str):
+    """Warm the feature and colour histogram indexes for one item type"""
+    index, histograms = feature_indexes[item_type], histogram_indexes[item_type]
+    if not FEATURE_INDEX_DIR:
+        return await rebuild_feature_index(item_type)
+    
+    # One worker per host rebuilds the shared indexes; the others wait for it and map the result
+    # Each index's lock also clears the epoch files a crashed rebuild left behind for it
+    async with index.build_lock(), histograms.build_lock():
+        if not (index.built_after(PROCESS_STARTED) and histograms.built_after(PROCESS_STARTED)):
+            await rebuild_feature_index(item_type)
+    return len(index)
+
+@app.on_event("startup")
+async def startup_feature_indexes():
+    """Backfill legacy image features, migrate embedded images and warm the feature indexes without blocking startup"""
+    image_pool.start()
+    if db is None:
+        return
+    
+    async def run():
+        global feature_indexes_ready
         try:
-            # Reshape for sklearn
-            features1 = features1.reshape(1, -1)
-            features2 = features2.reshape(1, -1)
+            for item_type in ("lost", "found"):
+                # Cheap and needed by quick search, so ahead of the image backfills
+                count = await backfill_location_terms(get_collection(item_type))
+                if count:
+                    print(f"Stored location terms for {count} {item_type} items")
+                count = await backfill_image_features(get_collection(item_type))
+                if count:
+                    print(f"Backfilled image features for {count} {item_type} items")
+                # Features are extracted from the embedded images first, then the images move out
+                count = await migrate_embedded_images(get_collection(item_type))
+                if count:
+                    print(f"Moved {count} embedded {item_type} item images to the image store")
+                count = await backfill_image_renditions(get_collection(item_type))
+                if count:
+                    print(f"Generated thumbnails for {count} {item_type} item images")
+                count = await backfill_image_hashes(get_collection(item_type))
+                if count:
+                    print(f"Computed perceptual hashes for {count} {item_type} item images")
+                count = await backfill_image_signatures(get_collection(item_type))
+                if count:
+                    print(f"Extracted ORB descriptors and colour histograms for {count} {item_type} item images")
+                await load_feature_index(item_type)
+                await load_duplicate_index(item_type)
+                # Migrated documents changed shape, so cached listings are rebuilt
+                await invalidate_responses(item_type)
+            feature_indexes_ready = True
             
-            # Calculate cosine similarity
-            similarity = cosine_similarity(features1, features2)[0][0]
-            
-            # Convert to percentage
-            return float(similarity * 100)
+            # Matching uses the warm feature indexes for image candidates
+            for item_type in ("lost", "found"):
+                count = await backfill_matches(item_type)
+                if count:
+                    print(f"Matched {count} existing {item_type} items")
         except Exception as e:
-            print(f"Similarity calculation error: {e}")
-            return 0.0
-
-# Initialize image similarity engine
-image_engine = ImageSimilarityEngine()
-
-# Utility functions
-def convert_objectid_to_str(obj):
-    """Convert ObjectId to string for JSON serialization"""
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    elif isinstance(obj, dict):
-        return {key: convert_objectid_to_str(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_objectid_to_str(item) for item in obj]
+            print(f"Feature index warm-up error: {e}")
+    
+    asyncio.create_task(run())
+
+async def fetch_ranked_items(item_types: List[str], ranked, projection: Dict[str, int] = ITEM_PROJECTION) -> List[Dict[str, Any]]:
+    """Load full documents for ranked (type position, item_id, score) results, keeping rank order"""
+    documents = {}
+    for position, item_type in enumerate(item_types):
+        ids = [item_id for index_position, item_id, score in ranked if index_position == position]
+        if not ids:
+            continue
+        cursor = get_collection(item_type).find({"id": {"$in": ids}, "status": "active"}, projection)
+        async for item in cursor:
+            documents[item["id"]] = item
+    
+    similar_items = []
+    for position, item_id, score in ranked:
+        item = documents.get(item_id)
+        if item is not None:
+            item['similarity_score'] = round(score * 100, 2)
+            similar_items.append(item)
+    return similar_items
+
+async def scan_stored_features(item_types: List[str], query_features: np.ndarray,
+                               projection: Dict[str, int] = ITEM_PROJECTION,
+                               filters: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
+    """Stream every matching active item's stored feature vector and score it against the query (used until the index is warm)"""
+    query = query_features / max(float(np.linalg.norm(query_features)), 1e-12)
+    threshold = VISUAL_SEARCH_THRESHOLD / 100
+    scanned = 0
+    # Bounded min-heap of (score, type position, item_id) so memory stays flat with collection size
+    top = []
+    
+    def score_batch(position, ids, vectors):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.maximum(np.linalg.norm(matrix, axis=1), 1e-12)
+        scores = (matrix @ query) / norms
+        for row in np.flatnonzero(scores >= threshold):
+            entry = (float(scores[row]), position, ids[row])
+            if len(top) < VISUAL_SEARCH_LIMIT:
+                heapq.heappush(top, entry)
+            elif entry > top[0]:
+                heapq.heapreplace(top, entry)
+    
+    for position, item_type in enumerate(item_types):
+        cursor = get_collection(item_type).find(
+            {"status": "active", "imageFeatures": {"$ne": None}, **(filters or {})},
+            FEATURE_PROJECTION,
+            batch_size=SCAN_BATCH_SIZE
+        )
+        ids, vectors = [], []
+        async for item in cursor:
+            ids.append(item["id"])
+            vectors.append(item["imageFeatures"])
+            if len(ids) >= SCAN_BATCH_SIZE:
+                score_batch(position, ids, vectors)
+                scanned += len(ids)
+                ids, vectors = [], []
+        if ids:
+            score_batch(position, ids, vectors)
+            scanned += len(ids)
+    
+    # None tells the caller there was nothing to compare against
+    if not scanned:
+        return None
+    
+    ranked = [(position, item_id, score) for score, position, item_id in sorted(top, reverse=True)]
+    return await fetch_ranked_items(item_types, ranked, projection)
+
+async def search_feature_indexes(item_types: List[str], query_features: np.ndarray, nprobe: Optional[int] = None,
+                                 projection: Dict[str, int] = ITEM_PROJECTION) -> List[Dict[str, Any]]:
+    """Rank items with the resident indexes and load full documents for the top matches only"""
+    ranked = search_indexes(
+        [feature_indexes[item_type] for item_type in item_types],
+        query_features,
+        k=VISUAL_SEARCH_LIMIT,
+        threshold=VISUAL_SEARCH_THRESHOLD / 100,
+        nprobe=nprobe
+    )
+    return await fetch_ranked_items(item_types, ranked, projection)
+
+async def rerank_by_descriptors(item_types: List[str], ranked, query_descriptors: bytes):
+    """Re-score ranked (type position, item_id, score) candidates by matching their stored ORB descriptors, best first"""
+    descriptors = {}
+    for position, item_type in enumerate(item_types):
+        ids = [item_id for index_position, item_id, score in ranked if index_position == position]
+        if not ids:
+            continue
+        cursor = get_collection(item_type).find({"id": {"$in": ids}, "status": "active"}, DESCRIPTOR_PROJECTION)
+        async for item in cursor:
+            if item.get("imageDescriptors"):
+                descriptors[item["id"]] = item["imageDescriptors"]
+    
+    candidates = [(position, item_id) for position, item_id, score in ranked if item_id in descriptors]
+    if not candidates:
+        return []
+    scores = await image_pool.match_descriptors(query_descriptors, [descriptors[item_id] for _, item_id in candidates])
+    return sorted(
+        ((position, item_id, score) for (position, item_id), score in zip(candidates, scores) if score >= DESCRIPTOR_MIN_SCORE),
+        key=lambda result: result[2],
+        reverse=True
+    )
+
+async def stored_signature(image_id: str) -> Optional[ImageSignature]:
+    """Signature already extracted for an item whose image has exactly these bytes, if any"""
+    for item_type in ("lost", "found"):
+        item = await get_collection(item_type).find_one(
+            {"imageId": image_id, "imageHistogram": {"$ne": None}}, SIGNATURE_PROJECTION
+        )
+        if item is not None:
+            return ImageSignature(item.get("imageFeatures"), item.get("imageDescriptors"), item.get("imageHistogram"))
+    return None
+
+async def query_signature(image: str) -> ImageSignature:
+    """Signature of an uploaded query image, from the cache, an item with the same image, or the image pool
+    
+    Raises ValueError when the image cannot be decoded.
+    """
+    data = decode_image_data(image)
+    # Same content address as the image store, so identical item images are found by imageId
+    key = blob_id_for(data)
+    signature = query_feature_cache.get(key)
+    if signature is not None:
+        return signature
+    
+    signature = await stored_signature(key)
+    if signature is not None:
+        query_feature_cache.reused += 1
     else:
-        return obj
+        signature = await image_pool.extract_query_signature(data)
+    return query_feature_cache.put(key, signature)
+
+def visual_search_filters(search_data: VisualSearchRequest) -> Dict[str, Any]:
+    """Metadata filters of a cascade search as a Mongo query; empty when there are none"""
+    query = {}
+    if search_data.category:
+        query["category"] = search_data.category
+    if search_data.dateFrom or search_data.dateTo:
+        # Item dates are ISO YYYY-MM-DD strings, which compare in date order
+        query["date"] = {}
+        if search_data.dateFrom:
+            query["date"]["$gte"] = search_data.dateFrom
+        if search_data.dateTo:
+            query["date"]["$lte"] = search_data.dateTo
+    return query
+
+async def cascade_search(item_types: List[str], query_histogram: List[float], query_descriptors: Optional[bytes],
+                         filters: Dict[str, Any], projection: Dict[str, int] = ITEM_PROJECTION):
+    """Rank items through successively more expensive stages, each working on the previous stage's survivors
+    
+    Metadata filters run in Mongo, colour histograms are scored for every remaining item,
+    ORB descriptors are matched for the best CASCADE_HISTOGRAM_CANDIDATES of those only, and
+    the top VISUAL_SEARCH_LIMIT are loaded. Returns the items and per-stage candidate counts and timings.
+    """
+    stages = []
+    started = time.perf_counter()
+    
+    def finish_stage(name: str, candidates: int):
+        nonlocal started
+        now = time.perf_counter()
+        stages.append({"stage": name, "candidates": candidates, "ms": round((now - started) * 1000, 2)})
+        started = now
+    
+    # Stage 1: metadata filters, served by the (status, category/date, createdAt) indexes
+    ids = None
+    if filters:
+        ids = set()
+        for item_type in item_types:
+            cursor = get_collection(item_type).find({"status": "active", **filters}, {"_id": 0, "id": 1}, batch_size=SCAN_BATCH_SIZE)
+            async for item in cursor:
+                ids.add(item["id"])
+        finish_stage("metadata", len(ids))
+    else:
+        finish_stage("metadata", sum(len(histogram_indexes[item_type]) for item_type in item_types))
+    
+    # Stage 2: colour histograms, one matrix-vector product over the remaining items
+    ranked = search_indexes(
+        [histogram_indexes[item_type] for item_type in item_types],
+        query_histogram,
+        k=CASCADE_HISTOGRAM_CANDIDATES,
+        threshold=CASCADE_HISTOGRAM_THRESHOLD,
+        ids=ids
+    )
+    finish_stage("histogram", len(ranked))
+    
+    # Stage 3: ORB descriptor matching on the short list
+    reranked = await rerank_by_descriptors(item_types, ranked, query_descriptors) if ranked and query_descriptors else []
+    finish_stage("descriptors", len(reranked))
+    
+    # Stage 4: load the final top results
+    similar_items = await fetch_ranked_items(item_types, reranked[:VISUAL_SEARCH_LIMIT], projection)
+    finish_stage("results", len(similar_items))
+    return similar_items, stages
+
+@app.on_event("startup")
+async def startup_ensure_indexes():
+    """Create the registered item indexes (a no-op when they already exist)"""
+    if db is None:
+        return
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        print(f"Index creation error: {e}")
+
+async def load_search_index(item_type: str):
+    """Rebuild the in-process search index for one item type from Mongo"""
+    engine = search_engines[item_type]
+    engine.clear()
+    cursor = get_collection(item_type).find({"status": "active"}, SEARCH_INDEX_PROJECTION, batch_size=SCAN_BATCH_SIZE)
+    async for item in cursor:
+        engine.add(item["id"], item)
+    return len(engine)
+
+async def refresh_search_index(item_type: str, since: datetime) -> int:
+    """Add items created since a time that the in-process search index lacks, such as those other workers inserted"""
+    engine = search_engines[item_type]
+    count = 0
+    cursor = get_collection(item_type).find(
+        {"status": "active", "createdAt": {"$gte": since}},
+        SEARCH_INDEX_PROJECTION,
+        batch_size=SCAN_BATCH_SIZE
+    )
+    async for item in cursor:
+        # Items are never edited, so ones already indexed are skipped rather than tombstoned and re-added
+        if item["id"] not in engine:
+            engine.add(item["id"], item)
+            count += 1
+    return count
+
+@app.on_event("startup")
+async def startup_search_indexes():
+    """Build the in-process fuzzy search indexes without blocking startup, then keep them caught up"""
+    if db is None or not FUZZY_SEARCH:
+        return
+    
+    async def run():
+        global search_engines_ready
+        started = datetime.utcnow()
+        try:
+            for item_type in ("lost", "found"):
+                await load_search_index(item_type)
+            search_engines_ready = True
+        except Exception as e:
+            print(f"Search index build error: {e}")
+            return
+        
+        while FUZZY_SEARCH_REFRESH > 0:
+            await asyncio.sleep(FUZZY_SEARCH_REFRESH)
+            # Reaching back a whole interval also covers items stamped with createdAt just before their insert landed
+            since = started - timedelta(seconds=FUZZY_SEARCH_REFRESH)
+            now = datetime.utcnow()
+            try:
+                for item_type in ("lost", "found"):
+                    await refresh_search_index(item_type, since)
+                # A failed pass is retried over the same window
+                started = now
+            except Exception as e:
+                print(f"Search index refresh error: {e}")
+    
+    asyncio.create_task(run())
+
+@app.on_event("startup")
+async def startup_job_queue():
+    """Start the background job workers and resume jobs left unfinished by the last run"""
+    if job_queue is None:
+        return
+    job_queue.register("process_item", process_item)
+    try:
+        await job_queue.start()
+    except Exception as e:
+        print(f"Job queue startup error: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_job_queue():
+    if job_queue is not None:
+        await job_queue.stop()
+
+@app.on_event("shutdown")
+async def shutdown_image_pool():
+    image_pool.shutdown()
 
 # Basic endpoints first
 @app.get("/api/health")
@@ -184,6 +1160,13 @@ async def health_check():
         return {
             "status": "healthy",
             "database": "connected", 
+            "responseCache": response_cache.stats(),
+            "queryFeatureCache": query_feature_cache.stats(),
+            "imagePool": {"workers": image_pool.workers, "restarts": image_pool.restarts},
+            "featureIndexes": {
+                "shared": bool(FEATURE_INDEX_DIR),
+                **{item_type: len(index) for item_type, index in feature_indexes.items()}
+            },
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -206,8 +1189,13 @@ async def root():
             "search_items": "/api/search/items",
             "report_lost": "/api/items/lost",
             "report_found": "/api/items/found",
+            "bulk_report": "/api/items/{item_type}/bulk",
             "get_lost_items": "/api/items/lost",
             "get_found_items": "/api/items/found",
+            "item_matches": "/api/items/{item_id}/matches",
+            "image": "/api/images/{image_id}",
+            "job": "/api/jobs/{job_id}",
+            "export": "/api/export",
             "health": "/api/health"
         }
     }
@@ -220,6 +1208,9 @@ async def quick_search(search_data: QuickSearchRequest):
         if db is None:
             raise HTTPException(status_code=500, detail="Database connection not available")
         
+        projection = item_projection(search_data.fields)
+        check_search_mode(search_data.mode)
+        
         # Build query based on search criteria
         query = {"status": "active"}
         
@@ -227,38 +1218,46 @@ async def quick_search(search_data: QuickSearchRequest):
             query["type"] = search_data.searchType
         
         if search_data.itemCategory:
-            query["category"] = {"$regex": search_data.itemCategory, "$options": "i"}
+            if search_data.mode == "regex":
+                query["category"] = {"$regex": search_data.itemCategory, "$options": "i"}
+            else:
+                # Categories come from a fixed list, so an exact match can use the category index
+                query["category"] = search_data.itemCategory
         
         if search_data.location:
-            query["$or"] = [
-                {"location": {"$regex": search_data.location, "$options": "i"}},
-                {"specificLocation": {"$regex": search_data.location, "$options": "i"}}
-            ]
+            if search_data.mode == "text":
+                # Every word must be a word of location or specificLocation, case-insensitively; whole
+                # words are equality matches on locationTerms, so the index still serves newest first
+                terms = tokenize(search_data.location)
+                if terms:
+                    query["locationTerms"] = {"$all": terms}
+            else:
+                query["$or"] = [
+                    {"location": {"$regex": search_data.location, "$options": "i"}},
+                    {"specificLocation": {"$regex": search_data.location, "$options": "i"}}
+                ]
         
         if search_data.date:
             query["date"] = search_data.date
         
-        # Search in both collections
-        lost_items = []
-        found_items = []
-        
-        if search_data.searchType in ["lost", "both"]:
-            lost_cursor = db.lost_items.find(query).sort("createdAt", -1).limit(20)
-            lost_items = await lost_cursor.to_list(length=20)
+        # Search the requested collections and merge them newest first
+        item_types = [item_type for item_type in ("lost", "found") if search_data.searchType in (item_type, "both")]
         
-        if search_data.searchType in ["found", "both"]:
-            found_cursor = db.found_items.find(query).sort("createdAt", -1).limit(20)
-            found_items = await found_cursor.to_list(length=20)
-        
-        # Combine results
-        all_items = lost_items + found_items
+        async def load():
+            all_items = await fetch_recent_items(item_types, query, projection, QUICK_SEARCH_LIMIT)
+            return {
+                "success": True,
+                "message": f"Found {len(all_items)} matching items",
+                "items": all_items
+            }
         
-        return {
-            "success": True,
-            "message": f"Found {len(all_items)} matching items",
-            "items": convert_objectid_to_str(all_items)
-        }
+        key = ("quick", search_data.searchType, search_data.itemCategory,
+               search_data.location and search_data.location.strip().lower(),
+               search_data.date, search_data.mode, normalize_fields(search_data.fields))
+        return await cached_response(key, item_types, load)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
@@ -269,11 +1268,23 @@ async def visual_search(search_data: VisualSearchRequest):
         if db is None:
             raise HTTPException(status_code=500, detail="Database connection not available")
         
-        # Convert uploaded image to OpenCV format
-        uploaded_image = image_engine.base64_to_image(search_data.imageBase64)
+        mode = search_data.mode or VISUAL_SEARCH_MODE
+        if mode not in VISUAL_SEARCH_MODES:
+            raise HTTPException(status_code=400, detail=f"mode must be one of {VISUAL_SEARCH_MODES}")
+        filters = visual_search_filters(search_data)
+        if filters and mode != "cascade":
+            raise HTTPException(status_code=400, detail="category and date filters require mode 'cascade'")
+        # Descriptor re-ranking and the cascade need the warm resident indexes for their candidates
+        rerank = mode in ("descriptors", "cascade") and feature_indexes_ready
         
-        # Extract features from uploaded image
-        uploaded_features = image_engine.extract_features(uploaded_image)
+        # Repeat uploads are served from the cache; others are decoded and featurized in the worker pool
+        started = time.perf_counter()
+        try:
+            signature = await query_signature(search_data.imageBase64)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        uploaded_features = signature.histogram if rerank and mode == "cascade" else signature.features
+        query_ms = round((time.perf_counter() - started) * 1000, 2)
         
         if uploaded_features is None:
             return {
@@ -282,68 +1293,54 @@ async def visual_search(search_data: VisualSearchRequest):
                 "items": []
             }
         
-        # Get all items from both collections that have images
-        all_items = []
-        
-        # Get lost items with images
-        if search_data.searchType in ["lost", "both"]:
-            lost_cursor = db.lost_items.find({
-                "status": "active", 
-                "image": {"$exists": True, "$ne": None, "$ne": ""}
-            })
-            lost_items = await lost_cursor.to_list(length=None)
-            all_items.extend(lost_items)
-        
-        # Get found items with images
-        if search_data.searchType in ["found", "both"]:
-            found_cursor = db.found_items.find({
-                "status": "active", 
-                "image": {"$exists": True, "$ne": None, "$ne": ""}
-            })
-            found_items = await found_cursor.to_list(length=None)
-            all_items.extend(found_items)
-        
-        if not all_items:
+        uploaded_features = np.asarray(uploaded_features, dtype=np.float32)
+        projection = item_projection(search_data.fields)
+        item_types = [item_type for item_type in ("lost", "found") if search_data.searchType in [item_type, "both"]]
+        
+        pipeline = None
+        if rerank and mode == "cascade":
+            has_candidates = any(len(histogram_indexes[item_type]) for item_type in item_types)
+            similar_items, stages = await cascade_search(
+                item_types, signature.histogram, signature.descriptors, filters, projection
+            )
+            pipeline = [{"stage": "query", "candidates": 1, "ms": query_ms}] + stages
+        elif rerank:
+            has_candidates = any(len(feature_indexes[item_type]) for item_type in item_types)
+            ranked = search_indexes(
+                [feature_indexes[item_type] for item_type in item_types],
+                uploaded_features,
+                k=DESCRIPTOR_RERANK_CANDIDATES,
+                threshold=VISUAL_SEARCH_THRESHOLD / 100,
+                nprobe=search_data.nprobe
+            )
+            reranked = await rerank_by_descriptors(item_types, ranked, signature.descriptors) if signature.descriptors else []
+            similar_items = await fetch_ranked_items(item_types, reranked[:VISUAL_SEARCH_LIMIT], projection)
+        elif feature_indexes_ready:
+            has_candidates = any(len(feature_indexes[item_type]) for item_type in item_types)
+            similar_items = await search_feature_indexes(item_types, uploaded_features, search_data.nprobe, projection)
+        else:
+            # Cascade filters still apply while the indexes warm up
+            similar_items = await scan_stored_features(item_types, uploaded_features, projection, filters)
+            has_candidates = similar_items is not None
+        
+        if not has_candidates:
             return {
                 "success": False,
                 "message": "No items with images found for comparison",
                 "items": []
             }
         
-        # Calculate similarity for each item
-        similar_items = []
-        
-        for item in all_items:
-            try:
-                # Extract features from database item image
-                item_image = image_engine.base64_to_image(item['image'])
-                item_features = image_engine.extract_features(item_image)
-                
-                if item_features is not None:
-                    # Calculate similarity
-                    similarity_score = image_engine.calculate_similarity(uploaded_features, item_features)
-                    
-                    # Only include items with significant similarity (>= 20%)
-                    if similarity_score >= 20:
-                        item['similarity_score'] = round(similarity_score, 2)
-                        similar_items.append(item)
-                        
-            except Exception as e:
-                print(f"Error processing item {item.get('id', 'unknown')}: {e}")
-                continue
-        
-        # Sort by similarity score (highest first)
-        similar_items.sort(key=lambda x: x['similarity_score'], reverse=True)
-        
-        # Limit results to top 15 matches
-        similar_items = similar_items[:15]
-        
-        return {
+        response = {
             "success": True,
             "message": f"Found {len(similar_items)} visually similar items",
-            "items": convert_objectid_to_str(similar_items)
+            "items": similar_items
         }
+        if pipeline is not None:
+            response["pipeline"] = pipeline
+        return FastJSONResponse(response)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Visual search failed: {str(e)}")
 
@@ -353,7 +1350,10 @@ async def search_items(
     q: Optional[str] = Query(None, description="Search query"),
     category: Optional[str] = Query(None, description="Category filter"),
     location: Optional[str] = Query(None, description="Location filter"),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, or 'all'"),
+    mode: str = Query("text", description="Search mode: 'text' (indexed, ranked by relevance), 'fuzzy' (typo tolerant) or 'regex'"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
 ):
     """Search items on lost/found pages"""
     try:
@@ -363,55 +1363,58 @@ async def search_items(
         if item_type not in ["lost", "found"]:
             raise HTTPException(status_code=400, detail="item_type must be 'lost' or 'found'")
         
+        check_search_mode(mode)
+        projection = item_projection(fields)
+        
         # Build search query
         query = {"status": "active"}
         
-        # Text search across multiple fields
-        if q:
-            query["$or"] = [
-                {"title": {"$regex": q, "$options": "i"}},
-                {"description": {"$regex": q, "$options": "i"}},
-                {"location": {"$regex": q, "$options": "i"}},
-                {"specificLocation": {"$regex": q, "$options": "i"}}
-            ]
+        # Fuzzy search uses the text index until the in-process indexes are built
+        if mode == "fuzzy" and not search_engines_ready:
+            mode = "text"
         
-        # Category filter
-        if category:
-            query["category"] = {"$regex": category, "$options": "i"}
-        
-        # Location filter
-        if location:
-            if "$or" in query:
-                # If text search exists, combine with location
-                query = {
-                    "$and": [
-                        query,
-                        {
-                            "$or": [
-                                {"location": {"$regex": location, "$options": "i"}},
-                                {"specificLocation": {"$regex": location, "$options": "i"}}
-                            ]
-                        }
-                    ]
-                }
-            else:
-                query["$or"] = [
-                    {"location": {"$regex": location, "$options": "i"}},
-                    {"specificLocation": {"$regex": location, "$options": "i"}}
-                ]
+        fuzzy_scores = None
+        if q and mode == "fuzzy":
+            # Rank in process, then let Mongo apply the remaining filters to the candidates
+            fuzzy_scores = dict(search_engines[item_type].search(q, k=FUZZY_SEARCH_CANDIDATES))
+            query["id"] = {"$in": list(fuzzy_scores)}
+        elif q and mode == "text":
+            # Rank by relevance and return the score with each item
+            projection = {**projection, "score": {"$meta": "textScore"}}
+        
+        # Relevance-ranked results have no stable (createdAt, _id) order to page through
+        ranked = bool(q) and mode in ("text", "fuzzy")
+        if cursor and ranked:
+            raise HTTPException(status_code=400, detail="cursor is only supported for date-ordered results; use mode=regex to page through matches")
+        
+        query = search_filter(query, None if mode == "fuzzy" else q, category, location, mode)
         
         # Choose collection based on type
         collection = db.lost_items if item_type == "lost" else db.found_items
         
         # Execute search
-        cursor = collection.find(query).sort("createdAt", -1).limit(limit)
-        items = await cursor.to_list(length=limit)
+        next_cursor = None
+        if fuzzy_scores is not None:
+            # Candidates are bounded by FUZZY_SEARCH_CANDIDATES, so they can be ranked here
+            cursor = collection.find(query, projection)
+            items = await cursor.to_list(length=len(fuzzy_scores))
+            for item in items:
+                item["score"] = fuzzy_scores[item["id"]]
+            items = sorted(items, key=lambda item: item["score"], reverse=True)[:limit]
+        elif ranked:
+            sort = [("score", {"$meta": "textScore"}), ("createdAt", -1)]
+            items = await collection.find(query, projection).sort(sort).limit(limit).to_list(length=limit)
+        else:
+            items, next_cursor = await fetch_page(collection, query, projection, limit, cursor)
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "count": len(items),
-            "items": convert_objectid_to_str(items)
-        }
+            "items": items,
+            "next_cursor": next_cursor,
+            # The mode that served the request: fuzzy falls back to text while its indexes build
+            "mode": mode
+        })
         
     except HTTPException:
         raise
@@ -420,36 +1423,58 @@ async def search_items(
 
 # CRUD endpoints
 @app.get("/api/items/lost")
-async def get_lost_items(limit: int = Query(50, ge=1, le=100)):
-    """Get all lost items"""
+async def get_lost_items(
+    limit: int = Query(50, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, or 'all'"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
+    """Get all lost items, newest first, one page at a time"""
     try:
         if db is None:
             raise HTTPException(status_code=500, detail="Database connection not available")
             
-        cursor = db.lost_items.find({"status": "active"}).sort("createdAt", -1).limit(limit)
-        items = await cursor.to_list(length=limit)
-        return {
-            "success": True,
-            "count": len(items),
-            "items": convert_objectid_to_str(items)
-        }
+        projection = item_projection(fields)
+        
+        async def load():
+            items, next_cursor = await fetch_page(db.lost_items, {"status": "active"}, projection, limit, cursor)
+            return {
+                "success": True,
+                "count": len(items),
+                "items": items,
+                "next_cursor": next_cursor
+            }
+        
+        return await cached_response(("items", "lost", limit, normalize_fields(fields), cursor), ["lost"], load)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch lost items: {str(e)}")
 
 @app.get("/api/items/found")
-async def get_found_items(limit: int = Query(50, ge=1, le=100)):
-    """Get all found items"""
+async def get_found_items(
+    limit: int = Query(50, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, or 'all'"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
+    """Get all found items, newest first, one page at a time"""
     try:
         if db is None:
             raise HTTPException(status_code=500, detail="Database connection not available")
             
-        cursor = db.found_items.find({"status": "active"}).sort("createdAt", -1).limit(limit)
-        items = await cursor.to_list(length=limit)
-        return {
-            "success": True,
-            "count": len(items),
-            "items": convert_objectid_to_str(items)
-        }
+        projection = item_projection(fields)
+        
+        async def load():
+            items, next_cursor = await fetch_page(db.found_items, {"status": "active"}, projection, limit, cursor)
+            return {
+                "success": True,
+                "count": len(items),
+                "items": items,
+                "next_cursor": next_cursor
+            }
+        
+        return await cached_response(("items", "found", limit, normalize_fields(fields), cursor), ["found"], load)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch found items: {str(e)}")
 
@@ -459,37 +1484,35 @@ async def report_lost_item(item_data: LostItemCreate):
     try:
         if db is None:
             raise HTTPException(status_code=500, detail="Database connection not available")
+        
+        # Store the image bytes outside the document
+        try:
+            image_fields = await store_uploaded_image(item_data.image)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
             
         # Create lost item document
-        lost_item = {
-            "id": str(uuid.uuid4()),
-            "type": "lost",
-            "title": item_data.title,
-            "category": item_data.category,
-            "description": item_data.description,
-            "location": item_data.location,
-            "specificLocation": item_data.specificLocation,
-            "date": item_data.date,
-            "image": item_data.image,
-            "status": "active",
-            "ownerInfo": item_data.ownerInfo,
-            "offerReward": item_data.offerReward,
-            "rewardAmount": item_data.rewardAmount,
-            "additionalNotes": item_data.additionalNotes,
-            "createdAt": datetime.utcnow(),
-            "updatedAt": datetime.utcnow()
-        }
+        lost_item = new_item_document("lost", item_data, image_fields)
+        
+        # Thumbnails, duplicate detection, visual indexing and matching follow in the background;
+        # the job is recorded before the item so a crash in between cannot strand it unprocessed
+        job_id = await job_queue.create("process_item", item_type="lost", item_id=lost_item["id"])
         
         # Insert into database
         result = await db.lost_items.insert_one(lost_item)
         lost_item["_id"] = str(result.inserted_id)
+        await index_new_items("lost", [lost_item])
+        job_queue.release([job_id])
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "message": "Lost item reported successfully",
-            "item": convert_objectid_to_str(lost_item)
-        }
+            "item": lost_item,
+            "jobId": job_id
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to report lost item: {str(e)}")
 
@@ -499,38 +1522,272 @@ async def report_found_item(item_data: FoundItemCreate):
     try:
         if db is None:
             raise HTTPException(status_code=500, detail="Database connection not available")
+        
+        # Store the image bytes outside the document
+        try:
+            image_fields = await store_uploaded_image(item_data.image)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
             
         # Create found item document
-        found_item = {
-            "id": str(uuid.uuid4()),
-            "type": "found",
-            "title": item_data.title,
-            "category": item_data.category,
-            "description": item_data.description,
-            "location": item_data.location,
-            "specificLocation": item_data.specificLocation,
-            "date": item_data.date,
-            "image": item_data.image,
-            "status": "active",
-            "finderInfo": item_data.finderInfo,
-            "additionalNotes": item_data.additionalNotes,
-            "createdAt": datetime.utcnow(),
-            "updatedAt": datetime.utcnow()
-        }
+        found_item = new_item_document("found", item_data, image_fields)
+        
+        # Thumbnails, duplicate detection, visual indexing and matching follow in the background;
+        # the job is recorded before the item so a crash in between cannot strand it unprocessed
+        job_id = await job_queue.create("process_item", item_type="found", item_id=found_item["id"])
         
         # Insert into database
         result = await db.found_items.insert_one(found_item)
         found_item["_id"] = str(result.inserted_id)
+        await index_new_items("found", [found_item])
+        job_queue.release([job_id])
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "message": "Found item reported successfully",
-            "item": convert_objectid_to_str(found_item)
-        }
+            "item": found_item,
+            "jobId": job_id
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to report found item: {str(e)}")
 
+@app.post("/api/items/{item_type}/bulk")
+async def bulk_report_items(
+    item_type: str,
+    items: List[Dict[str, Any]] = Body(..., description="Items in the same format as the single report endpoint")
+):
+    """Report a batch of lost or found items, e.g. an imported spreadsheet, with a result per item"""
+    try:
+        if db is None:
+            raise HTTPException(status_code=500, detail="Database connection not available")
+        
+        if item_type not in ITEM_MODELS:
+            raise HTTPException(status_code=400, detail="item_type must be 'lost' or 'found'")
+        
+        if not items or len(items) > BULK_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"Send between 1 and {BULK_MAX_ITEMS} items per request")
+        
+        # Items are validated one by one so a bad row is reported instead of rejecting the batch
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        valid = []
+        for position, raw_item in enumerate(items):
+            try:
+                valid.append((position, ITEM_MODELS[item_type].model_validate(raw_item)))
+            except ValidationError as e:
+                results[position] = {"index": position, "success": False, "error": validation_message(e)}
+        
+        async def store_image(item_data):
+            try:
+                return await store_uploaded_image(item_data.image)
+            except ValueError as e:
+                return e
+        
+        image_fields = await asyncio.gather(*(store_image(item_data) for _, item_data in valid))
+        
+        documents, positions = [], []
+        for (position, item_data), fields in zip(valid, image_fields):
+            if isinstance(fields, ValueError):
+                results[position] = {"index": position, "success": False, "error": str(fields)}
+                continue
+            documents.append(new_item_document(item_type, item_data, fields))
+            positions.append(position)
+        
+        # Jobs are recorded before their items, as in the single report endpoints
+        job_ids = await job_queue.create_many(
+            "process_item", [{"item_type": item_type, "item_id": document["id"]} for document in documents]
+        )
+        
+        # Unordered, so one failed write does not stop the rest of the batch
+        write_errors = {}
+        if documents:
+            try:
+                await get_collection(item_type).insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                write_errors = {error["index"]: error.get("errmsg", "Write failed") for error in e.details.get("writeErrors", [])}
+        
+        inserted, inserted_positions, inserted_job_ids, failed_job_ids = [], [], [], []
+        for index, (position, document, job_id) in enumerate(zip(positions, documents, job_ids)):
+            if index in write_errors:
+                results[position] = {"index": position, "success": False, "error": write_errors[index]}
+                failed_job_ids.append(job_id)
+            else:
+                inserted.append(document)
+                inserted_positions.append(position)
+                inserted_job_ids.append(job_id)
+        await job_queue.discard(failed_job_ids)
+        
+        # Image processing and matching run in the background job workers, in parallel
+        if inserted:
+            await index_new_items(item_type, inserted)
+            job_queue.release(inserted_job_ids)
+            for position, document, job_id in zip(inserted_positions, inserted, inserted_job_ids):
+                results[position] = {"index": position, "success": True, "id": document["id"], "jobId": job_id}
+        
+        return FastJSONResponse({
+            "success": True,
+            "message": f"Reported {len(inserted)} of {len(items)} {item_type} items",
+            "inserted": len(inserted),
+            "failed": len(items) - len(inserted),
+            "results": results
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Bulk report failed: {str(e)}")
+
+@app.get("/api/items/{item_id}/matches")
+async def get_item_matches(
+    item_id: str,
+    limit: int = Query(MATCH_LIMIT, ge=1, le=50),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return for matched items, or 'all'")
+):
+    """Likely counterparts of the opposite type for a lost or found item, best first"""
+    try:
+        if db is None:
+            raise HTTPException(status_code=500, detail="Database connection not available")
+        
+        projection = item_projection(fields)
+        item_type = None
+        for candidate_type in ("lost", "found"):
+            if await get_collection(candidate_type).find_one({"id": item_id}, {"_id": 1}):
+                item_type = candidate_type
+                break
+        if item_type is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        
+        key, other_key = ("lostId", "foundId") if item_type == "lost" else ("foundId", "lostId")
+        cursor = db.matches.find({key: item_id}, {"_id": 0}).sort("score", -1).limit(limit)
+        matches = await cursor.to_list(length=limit)
+        
+        # Counterparts that have since been resolved drop out
+        other_ids = [match[other_key] for match in matches]
+        items = await get_collection(OPPOSITE_TYPE[item_type]).find(
+            {"id": {"$in": other_ids}, "status": "active"}, projection
+        ).to_list(length=len(other_ids))
+        items_by_id = {item["id"]: item for item in items}
+        
+        results = [
+            {"score": round(match["score"], 4), "signals": match["signals"], "item": items_by_id[match[other_key]]}
+            for match in matches if match[other_key] in items_by_id
+        ]
+        return FastJSONResponse({
+            "success": True,
+            "itemId": item_id,
+            "type": item_type,
+            "count": len(results),
+            "matches": results
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch matches: {str(e)}")
+
+@app.get("/api/export")
+async def export_items(
+    item_type: str = Query("both", description="Type: lost, found or both"),
+    q: Optional[str] = Query(None, description="Search query"),
+    category: Optional[str] = Query(None, description="Category filter"),
+    location: Optional[str] = Query(None, description="Location filter"),
+    status: str = Query("active", description="Item status to export, or 'all'"),
+    fields: Optional[str] = Query(None, description="Comma separated fields to export; defaults to all"),
+    mode: str = Query("text", description="Search mode: 'text' or 'regex'"),
+    gzip: bool = Query(False, description="Compress the export with gzip"),
+    x_export_token: Optional[str] = Header(None)
+):
+    """Stream every matching item as NDJSON, for admin exports and backups"""
+    try:
+        if db is None:
+            raise HTTPException(status_code=500, detail="Database connection not available")
+        
+        # Exports include contact details, so they are only served to holders of the export token
+        if not EXPORT_TOKEN:
+            raise HTTPException(status_code=403, detail="Export is disabled on this server")
+        if not hmac.compare_digest(x_export_token or "", EXPORT_TOKEN):
+            raise HTTPException(status_code=403, detail="Invalid export token")
+        
+        if item_type not in ["lost", "found", "both"]:
+            raise HTTPException(status_code=400, detail="item_type must be 'lost', 'found' or 'both'")
+        
+        # Fuzzy ranking only covers a bounded candidate set, so it cannot drive a full export
+        if mode not in ["text", "regex"]:
+            raise HTTPException(status_code=400, detail="mode must be 'text' or 'regex'")
+        
+        item_types = ["lost", "found"] if item_type == "both" else [item_type]
+        query = {} if status == "all" else {"status": status}
+        query = search_filter(query, q, category, location, mode)
+        projection = item_projection(fields or "all")
+        
+        filename = f"{item_type}_items_{datetime.utcnow():%Y%m%d}.ndjson"
+        if gzip:
+            filename += ".gz"
+        return StreamingResponse(
+            export_chunks(item_types, query, projection, gzip),
+            media_type="application/gzip" if gzip else "application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a background job, e.g. the processing of a newly reported item"""
+    try:
+        if job_queue is None:
+            raise HTTPException(status_code=500, detail="Database connection not available")
+        
+        job = await job_queue.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return FastJSONResponse({"success": True, "job": job})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch job: {str(e)}")
+
+@app.get("/api/images/{image_id}")
+async def get_image(
+    image_id: str,
+    size: Optional[int] = Query(None, description="Rendition size in pixels, e.g. 64, 256 or 768")
+):
+    """Stream an item image, or one of its thumbnail renditions, from the image store"""
+    if image_store is None:
+        raise HTTPException(status_code=500, detail="Image store not available")
+    
+    blob = None
+    if size is not None:
+        if size not in THUMBNAIL_SIZES:
+            raise HTTPException(status_code=400, detail=f"size must be one of {THUMBNAIL_SIZES}")
+        blob = await image_store.open(rendition_id(image_id, size))
+    
+    # Images already smaller than the requested rendition, or whose renditions are still
+    # being generated, are served as-is
+    cache_control = "public, max-age=31536000, immutable"
+    if blob is None:
+        blob = await image_store.open(image_id)
+        if size is not None:
+            cache_control = "public, max-age=300"
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    # Image ids are content hashes, so a URL's bytes never change once its rendition exists
+    return StreamingResponse(
+        blob.chunks,
+        media_type=blob.content_type,
+        headers={
+            "Content-Length": str(blob.length),
+            "Cache-Control": cache_control
+        }
+    )
+
 # Serve static HTML files
 @app.get("/", response_class=HTMLResponse)
 async def serve_index():
@@ -565,5 +1822,8 @@ async def serve_report_lost():
         raise HTTPException(status_code=404, detail="Report lost page not found")
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    import sys
+    # Serve from a fresh interpreter that imports this file as the server module: spawned image pool
+    # workers re-run a script started as __main__, which would rebuild the app and its clients in each of them
+    os.execv(sys.executable, [sys.executable, "-m", "uvicorn", "server:app", "--host", "0.0.0.0", "--port", "8001",
+                              "--app-dir", os.path.dirname(os.path.abspath(__file__))])
\ No newline at end of file
@@ -0,0 +1,179 @@
+import asyncio
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from feature_index import FeatureIndex, SharedFeatureIndex
+from image_hash import MultiIndexHash, SharedHashIndex
+
+
+def sibling(connection, directory):
+    """Another worker process: opens the same shared indexes and runs commands sent by the test"""
+    indexes = {"features": SharedFeatureIndex(directory, "features", 8), "hashes": SharedHashIndex(directory, "hashes")}
+    while True:
+        command, name, args = connection.recv()
+        if command == "stop":
+            return
+        connection.send(getattr(indexes[name], command)(*args))
+
+
+@pytest.fixture
+def worker(tmp_path):
+    """Run commands against the shared indexes in tmp_path from a separate spawned process"""
+    connection, child_connection = multiprocessing.Pipe()
+    process = multiprocessing.get_context("spawn").Process(target=sibling, args=(child_connection, str(tmp_path)))
+    process.start()
+
+    def call(command, name, *args):
+        connection.send((command, name, args))
+        return connection.recv()
+
+    yield call
+    connection.send(("stop", None, None))
+    process.join(timeout=10)
+
+
+def unit(position, dim=8):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[position] = 1
+    return vector
+
+
+def ids(results):
+    return [item_id for item_id, _ in results]
+
+
+def test_writes_are_visible_across_processes(tmp_path, worker):
+    index = SharedFeatureIndex(str(tmp_path), "features", 8)
+    index.add("a", unit(0))
+    index.add("b", unit(1))
+    assert worker("__len__", "features") == 2
+    assert ids(worker("search", "features", unit(0), 1)) == ["a"]
+
+    # The sibling adds one item and replaces another; both are visible here on return
+    assert worker("add", "features", "c", unit(2)) is True
+    assert worker("add", "features", "a", unit(3)) is True
+    assert len(index) == 3
+    assert ids(index.search(unit(2), 1)) == ["c"]
+    assert ids(index.search(unit(3), 1)) == ["a"]
+    assert index.search(unit(0), 5) == []
+
+    assert worker("remove", "features", "c") is True
+    assert "c" not in index and len(index) == 2
+    assert index.remove("c") is False
+    assert worker("__contains__", "features", "b") is True
+    index.remove("b")
+    assert worker("__contains__", "features", "b") is False
+
+
+def test_rebuild_switches_every_process_to_the_new_epoch(tmp_path, worker):
+    index = SharedFeatureIndex(str(tmp_path), "features", 8)
+    for position in range(4):
+        index.add(f"old-{position}", unit(position))
+    assert worker("__len__", "features") == 4
+    old_files = {name for name in os.listdir(tmp_path) if name.startswith("features.") and name.endswith(".ids")}
+
+    with index.rebuilding() as stage:
+        stage.add("new", unit(5))
+        # Appended by a sibling mid-rebuild: carried over to the new epoch
+        assert worker("add", "features", "during", unit(6)) is True
+        # The current epoch keeps serving until the switch
+        assert worker("__len__", "features") == 5
+        assert ids(worker("search", "features", unit(0), 1)) == ["old-0"]
+
+    assert len(index) == 2
+    assert worker("__len__", "features") == 2
+    assert ids(worker("search", "features", unit(5), 1)) == ["new"]
+    assert ids(worker("search", "features", unit(6), 1)) == ["during"]
+    assert worker("search", "features", unit(0), 5) == []
+    assert worker("__contains__", "features", "old-0") is False
+    # The old epoch's files are gone and the sibling keeps writing to the new one
+    assert not old_files & set(os.listdir(tmp_path))
+    assert worker("add", "features", "after", unit(7)) is True
+    assert ids(index.search(unit(7), 1)) == ["after"]
+
+
+def test_shared_search_matches_in_process_search(tmp_path, worker):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 8)).astype(np.float32)
+    shared, resident = SharedFeatureIndex(str(tmp_path), "features", 8), FeatureIndex(8)
+    for position, vector in enumerate(vectors):
+        shared.add(str(position), vector)
+        resident.add(str(position), vector)
+
+    for query in rng.standard_normal((5, 8)).astype(np.float32):
+        expected = resident.search(query, 10, 0.2)
+        found = worker("search", "features", query, 10, 0.2)
+        assert ids(found) == ids(expected)
+        assert np.allclose([score for _, score in found], [score for _, score in expected], atol=1e-5)
+
+
+def test_hash_index_is_shared(tmp_path, worker):
+    index = SharedHashIndex(str(tmp_path), "hashes")
+    original = 0x0F0F_F0F0_3C3C_C3C3
+    index.add("original", original)
+
+    # A near-duplicate another worker checks for finds this worker's hash
+    assert worker("search", "hashes", original ^ 0b101, 6) == [("original", 2)]
+    assert worker("search", "hashes", original ^ 0b1111111, 6) == []
+    worker("add", "hashes", "repeat", original ^ 1)
+    assert index.search(original, 6) == [("original", 0), ("repeat", 1)]
+
+    # Removals and rebuilds by either process reach the other's lookup tables
+    assert worker("remove", "hashes", "original") is True
+    assert index.search(original, 6) == [("repeat", 1)]
+    with index.rebuilding() as stage:
+        stage.add("rebuilt", original ^ 0b11)
+    assert worker("search", "hashes", original, 6) == [("rebuilt", 2)]
+    assert worker("__len__", "hashes") == 1
+
+
+def test_shared_hash_search_matches_multi_index_hash(tmp_path, worker):
+    rng = np.random.default_rng(1)
+    shared, resident = SharedHashIndex(str(tmp_path), "hashes"), MultiIndexHash()
+    values = [int(value) for value in rng.integers(0, 2 ** 63, size=200, dtype=np.int64)]
+    for position, value in enumerate(values):
+        near = value ^ (1 << int(rng.integers(0, 64))) ^ (1 << int(rng.integers(0, 64)))
+        for item_id, item_value in ((f"{position}", value), (f"{position}-near", near)):
+            resident.add(item_id, item_value)
+            # Half the items are written by the sibling
+            if position % 2:
+                worker("add", "hashes", item_id, item_value)
+            else:
+                shared.add(item_id, item_value)
+
+    for value in values[:50]:
+        for radius in (0, 3, 6):
+            assert shared.search(value, radius) == resident.search(value, radius)
+            assert worker("search", "hashes", value, radius) == resident.search(value, radius)
+
+
+def test_build_lock_removes_epochs_left_by_crashed_rebuilds(tmp_path):
+    features, histograms = SharedFeatureIndex(str(tmp_path), "features", 8), SharedFeatureIndex(str(tmp_path), "histograms", 8)
+    hashes = SharedHashIndex(str(tmp_path), "hashes")
+    features.add("a", unit(0))
+    histograms.add("a", unit(0))
+    hashes.add("a", 1)
+
+    def epochs():
+        return {name for name in os.listdir(tmp_path) if name.endswith((".vectors", ".ids"))}
+
+    live = epochs()
+    # A rebuild killed before its switch leaves a staged epoch per index
+    stale = {f"{name}.99.{suffix}" for name in ("features", "histograms", "hashes") for suffix in ("vectors", "ids")}
+    for filename in stale:
+        (tmp_path / filename).write_bytes(b"")
+
+    async def take(index):
+        async with index.build_lock():
+            pass
+
+    # Each lock clears only its own index's leftovers and keeps the current epoch
+    asyncio.run(take(features))
+    assert epochs() == live | stale - {"features.99.vectors", "features.99.ids"}
+    asyncio.run(take(histograms))
+    asyncio.run(take(hashes))
+    assert epochs() == live
+    assert ids(histograms.search(unit(0), 1)) == ["a"] and hashes.search(1, 0) == [("a", 0)]
@@ -0,0 +1,75 @@
+from search_index import SearchIndex, edit_distance
+
+
+def build(documents):
+    index = SearchIndex()
+    for item_id, document in documents.items():
+        index.add(item_id, document)
+    return index
+
+
+def ids(results):
+    return [item_id for item_id, _ in results]
+
+
+def test_misspelled_terms_match_within_allowed_edits():
+    index = build({
+        "wallet": {"title": "Brown leather wallet", "location": "Main Library"},
+        "phone": {"title": "iPhone 13 with blue case", "location": "Cafeteria"},
+        "keys": {"title": "Car keys on a ring", "location": "Parking Lot"},
+    })
+    assert ids(index.search("walet")) == ["wallet"]
+    assert ids(index.search("iphnoe")) == ["phone"]
+    # Terms shorter than four characters must match exactly
+    assert index.search("cae") == []
+
+
+def test_transposition_is_one_edit():
+    assert edit_distance("iphnoe", "iphone", 2) == 1
+    assert edit_distance("walet", "wallet", 2) == 1
+    assert edit_distance("wallet", "laptop", 1) == 2
+
+
+def test_exact_match_outranks_fuzzy_match():
+    index = build({
+        "exact": {"title": "Black wallet"},
+        "fuzzy": {"title": "Black walle"},
+    })
+    assert ids(index.search("wallet")) == ["exact"]
+    assert ids(index.search("walle wallet")) == ["exact", "fuzzy"]
+
+
+def test_removed_documents_are_tombstoned():
+    index = build({
+        "a": {"title": "Blue umbrella"},
+        "b": {"title": "Red umbrella"},
+    })
+    assert index.remove("a") is True
+    assert index.remove("a") is False
+    assert len(index) == 1 and "a" not in index
+    assert ids(index.search("umbrella")) == ["b"]
+    assert ids(index.search("blue")) == []
+
+    # Re-adding replaces the tombstoned version
+    index.add("a", {"title": "Blue umbrella"})
+    assert ids(index.search("blue")) == ["a"]
+    index.add("b", {"title": "Green bottle"})
+    assert ids(index.search("umbrella")) == ["a"]
+
+
+def test_bm25_ranks_by_field_weight_frequency_and_rarity():
+    index = build({
+        "title": {"title": "Laptop charger", "description": "Left on a desk"},
+        "description": {"title": "Black bag", "description": "Contains a laptop charger"},
+        "other": {"title": "Water bottle", "description": "Steel bottle"},
+    })
+    # Title terms weigh more than description terms
+    assert ids(index.search("laptop")) == ["title", "description"]
+    # The rarer term decides the order when each document matches one term
+    assert ids(index.search("steel charger"))[0] == "other"
+
+    index = build({
+        "once": {"description": "bottle with a bag and a desk lamp"},
+        "twice": {"description": "bottle bottle and a bag and a desk"},
+    })
+    assert ids(index.search("bottle")) == ["twice", "once"]
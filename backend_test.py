@@ -6,6 +6,9 @@ import string
 import base64
 import os
 import traceback
+import time
+import struct
+import zlib
 from datetime import datetime
 
 # Get the backend URL from environment or use default
@@ -82,6 +85,7 @@ class UMTLostAndFoundTester:
         
         # Store created item IDs for cleanup
         self.created_lost_item_ids = []
+        self.created_job_ids = []
         self.created_found_item_ids = []
         
         # Sample base64 image (1x1 pixel transparent PNG)
@@ -94,6 +98,8 @@ class UMTLostAndFoundTester:
         assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
         data = response.json()
         assert data["status"] == "healthy", f"Expected status 'healthy', got {data['status']}"
+        indexes = data.get("featureIndexes", {})
+        assert "shared" in indexes and "lost" in indexes and "found" in indexes, "Response missing feature index sizes"
     
     @run_test
     def test_root_api(self):
@@ -120,9 +126,13 @@ class UMTLostAndFoundTester:
         assert data["success"] is True, f"Expected success to be True, got {data['success']}"
         assert "item" in data, "Response missing item data"
         assert data["item"]["title"] == test_data["title"], f"Title mismatch: {data['item']['title']} != {test_data['title']}"
+        assert data["jobId"], "Response missing background job id"
+        for field in ("imageFeatures", "imageDescriptors", "imageHistogram", "locationTerms"):
+            assert field not in data["item"], f"Response leaks stored {field}"
         
-        # Save item ID for later tests
+        # Save item and job IDs for later tests
         self.created_lost_item_ids.append(data["item"]["id"])
+        self.created_job_ids.append(data["jobId"])
     
     @run_test
     def test_report_found_item(self):
@@ -144,6 +154,114 @@ class UMTLostAndFoundTester:
         # Save item ID for later tests
         self.created_found_item_ids.append(data["item"]["id"])
     
+    @run_test
+    def test_bulk_report_items(self):
+        """Bulk report endpoint with per-item results"""
+        valid_item = self.test_found_item.copy()
+        invalid_item = {"title": "Missing required fields"}
+        
+        response = requests.post(
+            f"{BACKEND_URL}/api/items/found/bulk",
+            json=[valid_item, invalid_item]
+        )
+        assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+        data = response.json()
+        assert data["inserted"] == 1, f"Expected 1 inserted item, got {data['inserted']}"
+        assert data["failed"] == 1, f"Expected 1 failed item, got {data['failed']}"
+        assert data["results"][0]["success"] is True, "Valid item was not inserted"
+        assert data["results"][1]["success"] is False, "Invalid item was not rejected"
+        assert data["results"][0]["jobId"], "Inserted item missing background job id"
+        self.created_found_item_ids.append(data["results"][0]["id"])
+        self.created_job_ids.append(data["results"][0]["jobId"])
+        
+        response = requests.post(f"{BACKEND_URL}/api/items/found/bulk", json=[])
+        assert response.status_code == 400, f"Empty batch: Expected status code 400, got {response.status_code}"
+    
+    def textured_image(self, size=64, seed=7):
+        """Base64 grayscale PNG of random noise, detailed enough for an informative perceptual hash"""
+        rnd = random.Random(seed)
+        rows = b"".join(b"\x00" + bytes(rnd.randrange(256) for _ in range(size)) for _ in range(size))
+        
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+        
+        png = (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 0, 0, 0, 0))
+               + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+        return base64.b64encode(png).decode()
+    
+    def wait_for_job(self, job_id, attempts=20):
+        for _ in range(attempts):
+            job = requests.get(f"{BACKEND_URL}/api/jobs/{job_id}").json()["job"]
+            if job["status"] in ("done", "failed"):
+                return job
+            time.sleep(0.5)
+        return job
+    
+    @run_test
+    def test_job_status(self):
+        """Background job status endpoint"""
+        for job_id in self.created_job_ids:
+            # Item processing is quick for the tiny sample image
+            for _ in range(20):
+                response = requests.get(f"{BACKEND_URL}/api/jobs/{job_id}")
+                assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+                job = response.json()["job"]
+                if job["status"] in ("done", "failed"):
+                    break
+                time.sleep(0.5)
+            assert job["kind"] == "process_item", f"Unexpected job kind {job['kind']}"
+            assert job["status"] == "done", f"Job {job_id} ended as {job['status']}: {job['error']}"
+        
+        response = requests.get(f"{BACKEND_URL}/api/jobs/does-not-exist")
+        assert response.status_code == 404, f"Unknown job: Expected status code 404, got {response.status_code}"
+    
+    @run_test
+    def test_duplicate_detection(self):
+        """Near-duplicate image detection in background processing"""
+        test_data = self.test_lost_item.copy()
+        test_data["image"] = self.textured_image(seed=random.randrange(1 << 30))
+        
+        item_ids = []
+        for _ in range(2):
+            response = requests.post(f"{BACKEND_URL}/api/items/lost", json=test_data)
+            assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+            data = response.json()
+            job = self.wait_for_job(data["jobId"])
+            assert job["status"] == "done", f"Job {data['jobId']} ended as {job['status']}: {job['error']}"
+            item_ids.append(data["item"]["id"])
+            self.created_lost_item_ids.append(data["item"]["id"])
+        
+        response = requests.get(f"{BACKEND_URL}/api/items/lost?fields=id,duplicateOf")
+        assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+        items = {item["id"]: item for item in response.json()["items"]}
+        first, second = (items[item_id] for item_id in item_ids)
+        assert first["duplicateOf"] is None, f"First report linked to {first['duplicateOf']}"
+        assert second["duplicateOf"] == item_ids[0], f"Repeat report linked to {second['duplicateOf']}, expected {item_ids[0]}"
+    
+    @run_test
+    def test_get_item_image(self):
+        """Item image endpoint"""
+        response = requests.get(f"{BACKEND_URL}/api/items/lost")
+        assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+        items = [item for item in response.json()["items"] if item["id"] in self.created_lost_item_ids]
+        assert items, "Created lost item not found in response"
+        assert items[0]["image"].startswith("/api/images/"), f"Expected image URL, got {items[0]['image'][:40]}"
+        
+        response = requests.get(f"{BACKEND_URL}{items[0]['image']}")
+        assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+        assert response.content == base64.b64decode(self.sample_base64_image), "Image bytes mismatch"
+        assert response.headers["content-type"] == "image/png", f"Unexpected content type {response.headers['content-type']}"
+        assert "immutable" in response.headers.get("cache-control", ""), "Image response missing long-lived cache headers"
+        
+        # The 1x1 sample is smaller than every rendition, so its thumbnail falls back to the original
+        assert items[0]["thumbnail"], "Item missing thumbnail reference"
+        response = requests.get(f"{BACKEND_URL}{items[0]['thumbnail']}")
+        assert response.status_code == 200, f"Thumbnail: Expected status code 200, got {response.status_code}"
+        
+        # Unknown ids are not found
+        response = requests.get(f"{BACKEND_URL}/api/images/{'0' * 64}")
+        assert response.status_code == 404, f"Unknown image: Expected status code 404, got {response.status_code}"
+    
     @run_test
     def test_get_lost_items(self):
         """Get all lost items endpoint"""
@@ -174,6 +292,71 @@ class UMTLostAndFoundTester:
             item_ids = [item["id"] for item in data["items"]]
             assert any(item_id in item_ids for item_id in self.created_found_item_ids), "Created found item not found in response"
     
+    @run_test
+    def test_sparse_fieldsets(self):
+        """Field projection on list and search endpoints"""
+        # Listings leave contact details out by default
+        response = requests.get(f"{BACKEND_URL}/api/items/lost")
+        assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+        for item in response.json()["items"]:
+            assert "ownerInfo" not in item, "Default listing should not include ownerInfo"
+            assert "imageFeatures" not in item, "Listing leaked stored image features"
+        
+        response = requests.get(f"{BACKEND_URL}/api/search/items?item_type=lost&fields=title,ownerInfo")
+        assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+        for item in response.json()["items"]:
+            assert set(item) <= {"id", "title", "ownerInfo"}, f"Unexpected fields {sorted(item)}"
+        
+        response = requests.get(f"{BACKEND_URL}/api/items/found?fields=title,bogus")
+        assert response.status_code == 400, f"Unknown field: Expected status code 400, got {response.status_code}"
+    
+    @run_test
+    def test_response_cache(self):
+        """Repeated listing requests are served from the response cache"""
+        first = requests.get(f"{BACKEND_URL}/api/items/found?limit=7")
+        second = requests.get(f"{BACKEND_URL}/api/items/found?limit=7")
+        assert first.status_code == 200 and second.status_code == 200, "Expected status code 200"
+        assert second.headers.get("X-Cache") == "HIT", f"Expected a cache hit, got {second.headers.get('X-Cache')}"
+        assert first.json() == second.json(), "Cached response differs from the original"
+    
+    @run_test
+    def test_export_items(self):
+        """NDJSON export endpoint"""
+        token = os.environ.get("EXPORT_TOKEN")
+        if not token:
+            response = requests.get(f"{BACKEND_URL}/api/export")
+            assert response.status_code == 403, f"Export without token: Expected status code 403, got {response.status_code}"
+            return
+        
+        response = requests.get(f"{BACKEND_URL}/api/export?item_type=found&fields=title", headers={"X-Export-Token": token})
+        assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines, "Export returned no items"
+        assert all(set(item) <= {"id", "title"} for item in lines), "Export ignored the field projection"
+    
+    @run_test
+    def test_cursor_pagination(self):
+        """Cursor pagination through listings"""
+        # Walk every page and check no item is repeated
+        seen = []
+        cursor = None
+        while True:
+            url = f"{BACKEND_URL}/api/items/lost?limit=2&fields=title"
+            if cursor:
+                url += f"&cursor={cursor}"
+            response = requests.get(url)
+            assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+            data = response.json()
+            assert "next_cursor" in data, "Response missing next_cursor"
+            seen.extend(item["id"] for item in data["items"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        assert len(seen) == len(set(seen)), "Pages returned a repeated item"
+        
+        response = requests.get(f"{BACKEND_URL}/api/items/lost?cursor=not-a-cursor")
+        assert response.status_code == 400, f"Invalid cursor: Expected status code 400, got {response.status_code}"
+    
     @run_test
     def test_get_specific_item(self):
         """Get specific item endpoint"""
@@ -195,6 +378,23 @@ class UMTLostAndFoundTester:
             assert data["success"] is True, f"Found item: Expected success to be True, got {data['success']}"
             assert data["item"]["id"] == item_id, f"Found item: ID mismatch: {data['item']['id']} != {item_id}"
     
+    @run_test
+    def test_item_matches(self):
+        """Automatic lost/found matches endpoint"""
+        if self.created_lost_item_ids:
+            item_id = self.created_lost_item_ids[0]
+            response = requests.get(f"{BACKEND_URL}/api/items/{item_id}/matches")
+            assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+            data = response.json()
+            assert data["type"] == "lost", f"Expected type 'lost', got {data['type']}"
+            scores = [match["score"] for match in data["matches"]]
+            assert scores == sorted(scores, reverse=True), "Matches are not ordered by score"
+            for match in data["matches"]:
+                assert match["item"]["type"] == "found", "A lost item matched another lost item"
+        
+        response = requests.get(f"{BACKEND_URL}/api/items/does-not-exist/matches")
+        assert response.status_code == 404, f"Unknown item: Expected status code 404, got {response.status_code}"
+    
     @run_test
     def test_quick_search(self):
         """Quick search endpoint"""
@@ -215,6 +415,22 @@ class UMTLostAndFoundTester:
         assert "items" in data, "Lost search: Response missing items array"
         assert "success" in data, "Lost search: Response missing success field"
         assert "message" in data, "Lost search: Response missing message field"
+        # Location matches whole words of location or specificLocation, ignoring case
+        for item in data["items"]:
+            places = f"{item['location']} {item.get('specificLocation') or ''}".lower().split()
+            assert "library" in places, f"Lost search: Location {item['location']} does not match Library"
+        if self.created_lost_item_ids:
+            item_ids = [item["id"] for item in data["items"]]
+            assert self.created_lost_item_ids[0] in item_ids, "Lost search: Item reported in the University Library not found"
+
+            # Words of the specific location match too, in any case
+            response = requests.post(
+                f"{BACKEND_URL}/api/search/quick",
+                json={"searchType": "lost", "itemCategory": None, "location": "STUDY area", "date": None}
+            )
+            assert response.status_code == 200, f"Specific location search: Expected status code 200, got {response.status_code}"
+            item_ids = [item["id"] for item in response.json()["items"]]
+            assert self.created_lost_item_ids[0] in item_ids, "Specific location search: Created lost item not found"
         
         # Test searching for found items
         search_data = {
@@ -251,6 +467,9 @@ class UMTLostAndFoundTester:
         assert "items" in data, "Both search: Response missing items array"
         assert "success" in data, "Both search: Response missing success field"
         assert "message" in data, "Both search: Response missing message field"
+        assert len(data["items"]) <= 20, f"Both search: Expected at most 20 items, got {len(data['items'])}"
+        created = [item["createdAt"] for item in data["items"]]
+        assert created == sorted(created, reverse=True), "Both search: Items are not merged newest first"
         
         # Test with specific date
         today = datetime.now().strftime("%Y-%m-%d")
@@ -363,6 +582,56 @@ class UMTLostAndFoundTester:
         data = response.json()
         assert "items" in data, "Found image search: Response missing items array"
         
+        # Test descriptor re-ranking mode
+        search_data = {
+            "imageBase64": self.sample_base64_image,
+            "searchType": "both",
+            "mode": "descriptors"
+        }
+        
+        response = requests.post(
+            f"{BACKEND_URL}/api/search/visual",
+            json=search_data
+        )
+        assert response.status_code == 200, f"Descriptor image search: Expected status code 200, got {response.status_code}"
+        data = response.json()
+        assert "items" in data, "Descriptor image search: Response missing items array"
+        
+        # Test the cascaded pipeline with metadata filters
+        search_data = {
+            "imageBase64": self.sample_base64_image,
+            "searchType": "both",
+            "mode": "cascade",
+            "category": "Electronics",
+            "dateFrom": "2024-01-01"
+        }
+        
+        response = requests.post(
+            f"{BACKEND_URL}/api/search/visual",
+            json=search_data
+        )
+        assert response.status_code == 200, f"Cascade image search: Expected status code 200, got {response.status_code}"
+        data = response.json()
+        assert "items" in data, "Cascade image search: Response missing items array"
+        for item in data["items"]:
+            assert item["category"] == "Electronics", f"Cascade image search: category filter not applied, got {item['category']}"
+            assert item["date"] >= "2024-01-01", f"Cascade image search: date filter not applied, got {item['date']}"
+        
+        # Filters only apply to the cascade
+        search_data["mode"] = "vector"
+        response = requests.post(
+            f"{BACKEND_URL}/api/search/visual",
+            json=search_data
+        )
+        assert response.status_code == 400, f"Filtered vector image search: Expected status code 400, got {response.status_code}"
+        
+        search_data["mode"] = "invalid"
+        response = requests.post(
+            f"{BACKEND_URL}/api/search/visual",
+            json=search_data
+        )
+        assert response.status_code == 400, f"Invalid mode image search: Expected status code 400, got {response.status_code}"
+        
         # Test with invalid search type
         search_data = {
             "imageBase64": self.sample_base64_image,
@@ -403,6 +672,22 @@ class UMTLostAndFoundTester:
         # The API should handle empty image data gracefully
         assert response.status_code in [200, 400, 422], f"Empty image data: Expected status code 200, 400, or 422, got {response.status_code}"
     
+    @run_test
+    def test_query_feature_cache(self):
+        """Repeated visual searches reuse the cached query image features"""
+        search_data = {
+            "imageBase64": self.sample_base64_image,
+            "searchType": "both"
+        }
+        requests.post(f"{BACKEND_URL}/api/search/visual", json=search_data)
+        before = requests.get(f"{BACKEND_URL}/api/health").json()["queryFeatureCache"]
+        
+        search_data["searchType"] = "lost"
+        response = requests.post(f"{BACKEND_URL}/api/search/visual", json=search_data)
+        assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+        after = requests.get(f"{BACKEND_URL}/api/health").json()["queryFeatureCache"]
+        assert after["hits"] == before["hits"] + 1, f"Expected a cache hit, stats went from {before} to {after}"
+    
     @run_test
     def test_search_items(self):
         """Search items with filters endpoint"""
@@ -420,10 +705,49 @@ class UMTLostAndFoundTester:
         assert data["success"] is True, f"Found search: Expected success to be True, got {data['success']}"
         assert "items" in data, "Found search: Response missing items array"
         
+        # Test the regex fallback mode
+        response = requests.get(f"{BACKEND_URL}/api/search/items?item_type=lost&q=MacB&mode=regex")
+        assert response.status_code == 200, f"Regex search: Expected status code 200, got {response.status_code}"
+        assert response.json()["success"] is True, "Regex search: Expected success to be True"
+        
+        # Test text mode returns relevance scores
+        response = requests.get(f"{BACKEND_URL}/api/search/items?item_type=lost&q=MacBook&mode=text")
+        assert response.status_code == 200, f"Text search: Expected status code 200, got {response.status_code}"
+        for item in response.json()["items"]:
+            assert "score" in item, "Text search: item missing relevance score"
+        
+        # Test with invalid search mode
+        response = requests.get(f"{BACKEND_URL}/api/search/items?item_type=lost&q=MacBook&mode=invalid")
+        assert response.status_code == 400, f"Invalid mode: Expected status code 400, got {response.status_code}"
+        
         # Test with invalid item type
         response = requests.get(f"{BACKEND_URL}/api/search/items?item_type=invalid")
         assert response.status_code == 400, f"Invalid type: Expected status code 400, got {response.status_code}"
     
+    @run_test
+    def test_fuzzy_search(self):
+        """Typo-tolerant search endpoint"""
+        response = requests.get(f"{BACKEND_URL}/api/search/items?item_type=lost&q=MacBok&mode=fuzzy")
+        if response.status_code == 400:
+            # Fuzzy search is opt-in (FUZZY_SEARCH) on the server
+            assert "not enabled" in response.json()["detail"], f"Fuzzy search: unexpected error {response.text}"
+            return
+        assert response.status_code == 200, f"Fuzzy search: Expected status code 200, got {response.status_code}"
+        data = response.json()
+        assert data["mode"] in ("fuzzy", "text"), f"Fuzzy search: unexpected mode {data['mode']}"
+        
+        if data["mode"] == "text":
+            # The in-process indexes are still building, so the text index served the request
+            for item in data["items"]:
+                assert "score" in item, "Fuzzy search fallback: item missing text relevance score"
+            return
+        
+        found_ids = [item["id"] for item in data["items"]]
+        for item_id in self.created_lost_item_ids:
+            assert item_id in found_ids, f"Fuzzy search: misspelled query did not find item {item_id}"
+        scores = [item["score"] for item in data["items"]]
+        assert scores == sorted(scores, reverse=True), "Fuzzy search: items are not ranked by score"
+    
     @run_test
     def test_data_validation(self):
         """Data validation for item submission"""
@@ -470,12 +794,23 @@ def run_all_tests():
         tester.test_root_api,
         tester.test_report_lost_item,
         tester.test_report_found_item,
+        tester.test_bulk_report_items,
+        tester.test_job_status,
+        tester.test_duplicate_detection,
+        tester.test_get_item_image,
         tester.test_get_lost_items,
         tester.test_get_found_items,
+        tester.test_sparse_fieldsets,
+        tester.test_cursor_pagination,
+        tester.test_response_cache,
+        tester.test_export_items,
         tester.test_get_specific_item,
+        tester.test_item_matches,
         tester.test_quick_search,
         tester.test_visual_search,
+        tester.test_query_feature_cache,
         tester.test_search_items,
+        tester.test_fuzzy_search,
         tester.test_data_validation,
         tester.test_error_handling
     ]